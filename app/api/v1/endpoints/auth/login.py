@@ -2,8 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.services.auth_service import AuthService
-from app.services.user_service import UserService
+from app.services.auth_service import AuthService, USER_NOT_FOUND
 from app.schemas.auth import LoginRequest, AuthResponse
 
 router = APIRouter()
@@ -15,27 +14,19 @@ async def login(
     db: AsyncSession = Depends(get_db)
 ):
     """Login user with email and password"""
-    # Check if user exists
-    user_exists = await UserService.check_email_exists(db, login_data.email)
+    user, error = await AuthService.login_user(db, login_data.email, login_data.password)
 
-    if not user_exists:
+    if error == USER_NOT_FOUND:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found. Please register first."
+            detail=error
         )
-    # Authenticate user
-    user = await AuthService.authenticate_user(db, login_data.email, login_data.password)
-    # print(user)
-
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect password"
+            detail=error
         )
 
-    # Update last login
-    await UserService.update_last_login(db, user.user_id)
-
     # Generate tokens
     tokens = AuthService.create_user_tokens(user.user_id)
     response.set_cookie(
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form,UploadFile,File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 import cloudinary.uploader
 
-from app.database import get_db
+from app.database import get_read_db, unit_of_work
 from app.core.auth import get_current_user_id
 from app.services.user_service import UserService
 from app.services.auth_service import AuthService
@@ -28,11 +29,14 @@ async def complete_profile(
     preferred_language: str = Form(...),
     profile_picture: UploadFile = File(None),
     user_id: User = Depends(get_current_user_id),
-    db: AsyncSession = Depends(get_db)
 ):
-    """Complete user profile after registration"""
+    """
+    Complete user profile after registration. The Cloudinary upload runs
+    between two short units of work, without a DB connection checked out.
+    """
     # Check if username is available
-    username_exists = await UserService.get_user_by_user_id(db, user_id)
+    async with unit_of_work() as db:
+        username_exists = await UserService.get_user_by_user_id(db, user_id)
     print(user_id)
     print(username)
     print(username_exists)
@@ -60,7 +64,10 @@ async def complete_profile(
 
         profile_picture.file.seek(0)
 
-        upload_result = cloudinary.uploader.upload(profile_picture.file)
+        # Blocking SDK call: keep it off the event loop
+        upload_result = await run_in_threadpool(
+            cloudinary.uploader.upload, profile_picture.file
+        )
         image_url = upload_result["secure_url"]
 
     print(image_url)
@@ -76,9 +83,10 @@ async def complete_profile(
     )
 
     # Complete profile
-    updated_user = await UserService.complete_user_profile(
-        db, user_id, profile_update
-    )
+    async with unit_of_work() as db:
+        updated_user = await UserService.complete_user_profile(
+            db, user_id, profile_update
+        )
 
     if not updated_user:
         raise HTTPException(
@@ -104,7 +112,7 @@ async def complete_profile(
 async def get_current_user_profile(
     user_id: int = Depends(get_current_user_id),
     response_model = UserResponse,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):  
     user = await UserService.get_user_by_user_id(db,user_id)
     return user
\ No newline at end of file
@@ -3,7 +3,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.services.auth_service import AuthService
-from app.services.user_service import UserService
 from app.schemas.auth import RegisterRequest, AuthResponse
 from app.schemas.user import UserCreate
 from app.core.auth import verify_token
@@ -17,15 +16,6 @@ async def register(
 ):
     """Register new user with email and password"""
     try:
-        # Check if user already exists
-        user_exists = await UserService.check_email_exists(db, register_data.email)
-        
-        if user_exists:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User already exists. Please login instead."
-            )
-        
         # Create minimal user data for registration - only email and password
         user_create = UserCreate(
             email=register_data.email,
@@ -33,7 +23,7 @@ async def register(
             # All other fields are optional and will be None by default
         )
         
-        # Create user
+        # Create user (also rejects an already registered email)
         user, error = await AuthService.create_user(db, user_create)
         
         if error:
@@ -61,6 +51,8 @@ async def register(
             message="Registration successful. Please complete your profile."
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Registration error: {e}")
         raise HTTPException(
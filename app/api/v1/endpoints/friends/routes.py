@@ -3,7 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.friend import Friend
 from app.core.auth import get_current_user_id
 from app.models.user import User
@@ -36,7 +36,7 @@ async def get_friends_list(
 )
 async def get_all_user(
     user_id: int  = Depends(get_current_user_id),
-    db:AsyncSession=Depends(get_db)
+    db:AsyncSession=Depends(get_read_db)
 ):  
     stmt = select(User).where(User.is_verified == True, User.user_id != user_id)
     result = await db.execute(stmt)
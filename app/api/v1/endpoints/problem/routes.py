@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.orm import Session
-from app.services import problem_service
+from app.config import settings
+from app.services import problem_cache, problem_service
 from app.schemas.problem import ProblemResponse
-from app.database import get_db
+from app.database import get_read_db
 
 router = APIRouter()
 
@@ -10,37 +13,57 @@ router = APIRouter()
 @router.get(
     "/problems/random",
     response_model=ProblemResponse,
-    summary="Get a random problem by difficulty"
+    summary="Get a random problem by difficulty (and optionally topic)"
 )
 
 async def get_random_problem(
     difficulty:str,
-    db: Session = Depends(get_db)
+    topic_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
 ):
     # Fetching problems on the basis of "easy","medium","hard"
-    problem = await problem_service.get_random_problem_by_difficulty(db,difficulty.title())
+    cached = await problem_service.get_random_problem_by_difficulty(
+        db, difficulty.title(), topic_id
+    )
 
-    if not problem:
+    if not cached:
         raise HTTPException(
             status_code=404,
             detail=f"No active problem found with difficulty: {difficulty}"
         )
-    
-    return problem
+
+    # Same pre-serialized body as /problems/{id}; a different one each call
+    return Response(
+        content=cached.body,
+        media_type="application/json",
+        headers={"Cache-Control": "no-store"},
+    )
 
 
 # API for particular problem
 @router.get(
     "/problems/{problem_id}",
     response_model=ProblemResponse,
-    summary="Get a single problem by its ID"
+    summary="Get a single problem by its ID",
+    responses={304: {"description": "Not modified (If-None-Match matched the ETag)"}},
 )
 
 
-async def get_problem(problem_id: int, db:Session = Depends(get_db)):
-    problem = await problem_service.get_problem_by_id(db,problem_id)
-    if not problem:
-        raise HTTPException(status_code=404,details="Problem not found")
+async def get_problem(
+    problem_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db:Session = Depends(get_read_db)
+):
+    # Pre-serialized, so a hit costs one version query and no validation
+    cached = await problem_cache.get_problem_response(db,problem_id)
+    if not cached:
+        raise HTTPException(status_code=404,detail="Problem not found")
 
-    return problem
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={settings.PROBLEM_CACHE_MAX_AGE}",
+    }
+    if problem_cache.etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
 
+    return Response(content=cached.body, media_type="application/json", headers=headers)
@@ -23,9 +23,9 @@ router = APIRouter()
 )
 async def run_code(
     run_request: CodeRunRequest,
-    db: Session = Depends(get_db)
 ):
-    result = await submission_service.run_code_service(db,run_request)
+    # No request-wide session: the service opens one only around its SQL
+    result = await submission_service.run_code_service(run_request)
     if "error" in result:
         raise HTTPException(status_code=500,detail=result)
     return result
@@ -38,19 +38,18 @@ async def run_code(
 )
 async def submit_code(
     submission_in: SolutionSubmitRequest,
-    db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ) -> Any:
     """
-    Receives code from frontend,send to submission service to be
-    executed by Judge0 and returns final result
+    Receives code from frontend and queues it for the judge workers.
+    Returns the submission straight away with verdict "Queued"; poll
+    GET /submission/{submission_id} for the final result.
 
     - **submission_in**: The code, language ID, and stdin from the user.
     - **current_user**: The user data, injected by the auth dependency.
     """
 
     result = await submission_service.submit_solution_service(
-        db=db,
         submission_in=submission_in,
         user_id=user_id # Pass user id to the service
     )
@@ -66,4 +65,27 @@ async def submit_code(
 @router.get("/test-db")
 async def test_db(db: AsyncSession = Depends(get_db)):
     result = await db.execute(text("SELECT NOW()"))
-    return {"database_time": str(result.scalar_one())}
\ No newline at end of file
+    return {"database_time": str(result.scalar_one())}
+
+
+# For polling a queued submission
+@router.get(
+    "/{submission_id}",
+    response_model=SubmissionResponse,
+    summary="Get a submission and its verdict"
+)
+async def get_submission(
+    submission_id: int,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+) -> Any:
+    submission = await submission_service.get_submission_service(
+        db=db,
+        submission_id=submission_id,
+        user_id=user_id
+    )
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+
+    return submission
+
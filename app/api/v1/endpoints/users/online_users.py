@@ -1,9 +1,28 @@
-from fastapi import APIRouter
-from app.core.redis import redis_client
+from fastapi import APIRouter, HTTPException, Query
+from app.services.webSocket import presence_service
 
 router = APIRouter()
 
+MAX_PRESENCE_IDS = 500
+
+@router.get("/online")
+async def get_users_status(
+    ids: str = Query(..., description="Comma-separated user ids, e.g. 1,2,3")
+):
+    try:
+        user_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be comma-separated integers")
+    if len(user_ids) > MAX_PRESENCE_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_PRESENCE_IDS} ids per request")
+
+    status = await presence_service.get_online_status(user_ids)
+    return [
+        {"user_id": user_id, "online": online}
+        for user_id, online in status.items()
+    ]
+
 @router.get("/online/{user_id}")
-def get_user_status(user_id: int):
-    is_online = redis_client.sismember("online_users", user_id)
+async def get_user_status(user_id: int):
+    is_online = await presence_service.is_user_online(user_id)
     return {"user_id": user_id, "online": is_online}
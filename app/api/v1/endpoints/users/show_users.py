@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
+from app.database import get_read_db
 from app.schemas.user import PaginatedUsers
 from app.services.user_service import UserService
 from app.core.auth import get_current_user_id
@@ -11,7 +11,7 @@ router = APIRouter()
 async def list_users(
     limit: int = Query(20, ge=1, le=50),
     cursor: int = Query(0, ge=0),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user_id: int = Depends(get_current_user_id)
 ):
     users, next_cursor = await UserService.get_users_paginated(
@@ -1,13 +1,37 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    # Optional read replica for read-only routes (falls back to the primary)
+    DATABASE_REPLICA_URL: Optional[str] = None
+    # Per-process pool; DB_POOL_RECYCLE (seconds) retires connections before
+    # the server or a proxy drops them, which is what makes pre-ping (one
+    # extra round-trip per checkout) safe to turn off
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 30
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_REPLICA_POOL_SIZE: int = 10
+    DB_REPLICA_MAX_OVERFLOW: int = 20
+    # Prepared statements cached per connection (0 disables)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Behind pgbouncer in transaction pooling: no client-side pool, no
+    # statement cache and unique prepared statement names
+    DB_PGBOUNCER: bool = False
 
     # JWT
     SECRET_KEY: str 
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    # Decoded-JWT LRU used by the HTTP and websocket auth paths
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    # Password hashing: pbkdf2_sha256 rounds (cost) and dedicated worker threads
+    PASSWORD_HASH_ROUNDS: int = 29000
+    PASSWORD_HASH_WORKERS: int = 2
 
     # Google Auth
     GOOGLE_CLIENT_ID: str
@@ -18,6 +42,109 @@ class Settings(BaseSettings):
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
 
+    # Redis
+    REDIS_URL: str = "redis://localhost:6379/0"
+    # One pool per process; callers wait up to REDIS_POOL_TIMEOUT for a
+    # free connection instead of failing when it is exhausted.
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+
+    # Presence: connections expire after PRESENCE_TTL seconds unless the
+    # owning process refreshes them (and sweeps stale users) every
+    # PRESENCE_HEARTBEAT_INTERVAL seconds.
+    PRESENCE_TTL: int = 60
+    PRESENCE_HEARTBEAT_INTERVAL: float = 20.0
+
+    # Websocket fan-out: users are spread over this many Redis channels and
+    # sends are batched for WS_BATCH_WINDOW seconds before publishing.
+    WS_CHANNEL_SHARDS: int = 64
+    WS_BATCH_WINDOW: float = 0.005
+    # Per-connection outbound queue (messages) and app-level keepalive for
+    # clients on protocol 2 (/ws?protocol=2): a socket that sends nothing
+    # (not even a pong) for WS_PING_TIMEOUT seconds is closed. Protocol 1
+    # clients only get the server's websocket-level ping/pong.
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_PING_INTERVAL: float = 20.0
+    WS_PING_TIMEOUT: float = 60.0
+
+    # Piston (code runner)
+    PISTON_API_URL: str = "http://20.247.28.65:2000/api/v2/execute"
+    # Comma-separated execute URLs; empty = PISTON_API_URL only.
+    # fake://?latency=0.05&compile_cost=0.2&failure_rate=0.01 is an in-process fake.
+    PISTON_BACKENDS: str = ""
+    PISTON_HEALTH_INTERVAL: float = 10.0
+    PISTON_CIRCUIT_FAILURES: int = 3
+    PISTON_CIRCUIT_RESET: float = 30.0
+    PISTON_RETRY_ATTEMPTS: int = 1
+    PISTON_TIMEOUT: float = 20.0
+    PISTON_POOL_TIMEOUT: float = 10.0
+    PISTON_MAX_CONNECTIONS: int = 64
+    PISTON_MAX_KEEPALIVE_CONNECTIONS: int = 32
+    PISTON_KEEPALIVE_EXPIRY: float = 30.0
+    PISTON_HTTP2: bool = True
+    PISTON_MAX_CONCURRENCY: int = 64
+    # Per-job limits (ms). Problem time limits are capped to the runner's max.
+    PISTON_COMPILE_TIMEOUT: int = 10000
+    PISTON_MAX_RUN_TIMEOUT: int = 3000
+    # Compile once / run many for C and C++. The batch run timeout (ms) is
+    # capped to PISTON_MAX_RUN_TIMEOUT (Piston answers 400 above its own
+    # run_timeout limit); cases it cuts off are re-run one by one. Batches
+    # whose inputs exceed PISTON_BATCH_MAX_INPUT_BYTES aren't batched, as
+    # the inputs are compiled into the program. A batch holds at most
+    # PISTON_BATCH_SIZE cases and only as many as their expected output
+    # plus marker lines fit in PISTON_OUTPUT_MAX_SIZE, the runner's
+    # output_max_size (chars per stream; Piston kills jobs that exceed it).
+    PISTON_BATCH_ENABLED: bool = True
+    PISTON_BATCH_SIZE: int = 25
+    PISTON_OUTPUT_MAX_SIZE: int = 1024
+    PISTON_BATCH_RUN_TIMEOUT: int = 3000
+    PISTON_BATCH_MAX_INPUT_BYTES: int = 1024 * 1024
+
+    # Judge queue (0 in-process workers = judge only via `python -m app.judge`)
+    JUDGE_WORKERS: int = 4
+    JUDGE_POLL_INTERVAL: float = 1.0
+    # A claim not refreshed for JUDGE_STALE_SECONDS is considered abandoned
+    # (workers refresh theirs while judging); every worker pool checks for
+    # abandoned claims each JUDGE_REQUEUE_INTERVAL seconds.
+    JUDGE_STALE_SECONDS: int = 300
+    JUDGE_REQUEUE_INTERVAL: float = 60.0
+    # Stop judging at the first failing test case, running cases in waves
+    JUDGE_FAIL_FAST: bool = False
+    JUDGE_WAVE_SIZE: int = 8
+
+    # Test case cache (in-process LRU bounded in bytes, then Redis)
+    TEST_CASE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    TEST_CASE_CACHE_LOCAL_TTL: int = 60
+    TEST_CASE_CACHE_REDIS_TTL: int = 3600
+    # Random problem picks: Redis sets of active ids per difficulty/topic,
+    # fully rebuilt from the table this often (seconds)
+    PROBLEM_INDEX_TTL: int = 3600
+    # Serialized GET /problems/{id} responses; browsers and CDNs may reuse
+    # them for PROBLEM_CACHE_MAX_AGE seconds, then revalidate with the ETag
+    PROBLEM_CACHE_MAX_ENTRIES: int = 5000
+    PROBLEM_CACHE_LOCAL_TTL: int = 60
+    PROBLEM_CACHE_REDIS_TTL: int = 3600
+    PROBLEM_CACHE_MAX_AGE: int = 60
+
+    # Memoized Run/Submit results for identical (problem, language, source)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
+    RESULT_CACHE_TTL: int = 600
+    # Results using more than this fraction of the time or memory limit on
+    # any case are not stored (they could flip verdict on a rerun)
+    RESULT_CACHE_LIMIT_MARGIN: float = 0.8
+
+    # User status (exists + active) cache for HTTP auth and websocket connect
+    USER_STATUS_CACHE_MAX_ENTRIES: int = 100000
+    USER_STATUS_CACHE_LOCAL_TTL: int = 10
+    USER_STATUS_CACHE_REDIS_TTL: int = 60
+
+    # Write-behind last_login / last_seen (seconds between bulk flushes,
+    # rows per UPDATE ... FROM (VALUES ...))
+    LAST_SEEN_FLUSH_INTERVAL: float = 5.0
+    LAST_SEEN_FLUSH_BATCH: int = 1000
+
     # Application
     PROJECT_NAME: str = "CodeRed"
     VERSION: str = "1.0.0"
@@ -1,15 +1,10 @@
-from fastapi import Request, HTTPException, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Request, HTTPException, status
 
 from app.core.security import verify_token
-from app.database import get_db
 from app.models.user import User
-from app.services.auth_service import AuthService
+from app.services import user_status_cache
 
-async def get_current_user_id(
-    request: Request,
-    db: AsyncSession = Depends(get_db)
-) -> User:
+async def get_current_user_id(request: Request) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Not authenticated",
@@ -23,8 +18,14 @@ async def get_current_user_id(
     if payload is None:
         raise credentials_exception
 
-    user_id = int(payload.get("sub"))
-    if user_id is None:
+    sub = payload.get("sub")
+    if sub is None:
+        raise credentials_exception
+    user_id = int(sub)
+
+    # Cached, so the common case costs no DB query; a miss uses its own
+    # short-lived session rather than pinning one for the whole request
+    if not await user_status_cache.is_user_active(user_id):
         raise credentials_exception
 
     return user_id
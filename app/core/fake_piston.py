@@ -0,0 +1,185 @@
+## in-process stand-in for a Piston runner (tests, benchmarks, local dev)
+import asyncio
+import random
+import re
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# The fake never executes anything. Every program behaves like `cat`:
+# stdout is the stdin it was given. Sources containing one of the markers
+# below misbehave on purpose so every verdict can be produced:
+#   FAKE_COMPILE_ERROR  -> compile stage fails (compiled languages only)
+#   FAKE_RUNTIME_ERROR  -> run stage exits with code 1
+#   FAKE_WRONG_ANSWER   -> prints nothing
+# Like stock Piston it rejects jobs whose timeouts exceed its configured
+# limits, kills a run whose stdout or stderr exceeds output_max_size, and
+# its gcc/g++ compile every uploaded file (so anything but C/C++ source
+# among the files is a compilation error).
+COMPILED_LANGUAGES = {"c", "c++", "java"}
+COMPILE_ALL_FILES = {"c", "c++"}
+
+# Piston's defaults (PISTON_RUN_TIMEOUT / PISTON_COMPILE_TIMEOUT)
+MAX_RUN_TIMEOUT = 3000
+MAX_COMPILE_TIMEOUT = 10000
+OUTPUT_MAX_SIZE = 1024
+
+BATCH_MARKER = re.compile(r"@@codered-[0-9a-f]+@@")
+# static const char codered_input_N[] = "..." "...";
+BATCH_INPUT = re.compile(r'static const char codered_input_(\d+)\[\] =((?:\s*"[^"]*")+);')
+LITERAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+class RunnerUnavailable(Exception):
+    """Raised for simulated runner failures (like a dropped connection)"""
+
+
+class RunnerRejected(Exception):
+    """Raised for jobs real Piston answers with HTTP 400"""
+
+
+class FakePiston:
+    """
+    Emulates POST /api/v2/execute, including the compile-once batch
+    harness from app.services.piston_batch.
+
+    latency       seconds added to every request
+    compile_cost  extra seconds for compiled languages
+    failure_rate  probability (0..1) that a request raises RunnerUnavailable
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        compile_cost: float = 0.0,
+        failure_rate: float = 0.0,
+        max_run_timeout: int = MAX_RUN_TIMEOUT,
+        max_compile_timeout: int = MAX_COMPILE_TIMEOUT,
+        output_max_size: int = OUTPUT_MAX_SIZE,
+    ):
+        self.latency = latency
+        self.compile_cost = compile_cost
+        self.failure_rate = failure_rate
+        self.max_run_timeout = max_run_timeout
+        self.max_compile_timeout = max_compile_timeout
+        self.output_max_size = output_max_size
+        self.calls = 0
+
+    @classmethod
+    def from_url(cls, url: str) -> "FakePiston":
+        """fake://name?latency=0.05&compile_cost=0.2&failure_rate=0.01&output_max_size=1024"""
+        query = parse_qs(urlparse(url).query)
+
+        def option(name: str) -> float:
+            return float(query.get(name, ["0"])[0])
+
+        return cls(
+            latency=option("latency"),
+            compile_cost=option("compile_cost"),
+            failure_rate=option("failure_rate"),
+            output_max_size=int(query.get("output_max_size", [OUTPUT_MAX_SIZE])[0]),
+        )
+
+    async def runtimes(self) -> List[Dict[str, Any]]:
+        return [
+            {"language": language, "version": "0.0.0", "aliases": []}
+            for language in ("python", "javascript", *sorted(COMPILED_LANGUAGES))
+        ]
+
+    async def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls += 1
+        language: str = payload.get("language", "")
+        files: List[Dict[str, Any]] = payload.get("files") or [{}]
+        source: str = files[0].get("content", "") or ""
+        compiled = language in COMPILED_LANGUAGES
+
+        for key, limit in (
+            ("run_timeout", self.max_run_timeout),
+            ("compile_timeout", self.max_compile_timeout),
+        ):
+            value = payload.get(key)
+            if value is not None and value > limit:
+                raise RunnerRejected(f"{key} cannot exceed the configured limit of {limit}")
+
+        delay = self.latency + (self.compile_cost if compiled else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RunnerUnavailable("simulated runner failure")
+
+        response: Dict[str, Any] = {"language": language, "version": "0.0.0"}
+
+        if compiled:
+            if "FAKE_COMPILE_ERROR" in source:
+                response["compile"] = self._stage(1, stderr="fake: compilation failed")
+                return response
+            if language in COMPILE_ALL_FILES and len(files) > 1:
+                names = ", ".join(f.get("name") or "?" for f in files[1:])
+                response["compile"] = self._stage(
+                    1, stderr=f"fake: {names}: not valid {language} source"
+                )
+                return response
+            response["compile"] = self._stage(0)
+
+        marker = BATCH_MARKER.search(source)
+        if marker:
+            run = self._run_batch(source, marker.group(0))
+        else:
+            run = self._run_once(source, payload.get("stdin", "") or "")
+        response["run"] = self._cap_output(run)
+        return response
+
+    def _cap_output(self, stage: Dict[str, Any]) -> Dict[str, Any]:
+        # Piston SIGKILLs the run once a stream passes output_max_size
+        for stream, status in (("stdout", "OL"), ("stderr", "EL")):
+            if len(stage[stream]) > self.output_max_size:
+                stage[stream] = stage[stream][:self.output_max_size]
+                stage.update(code=None, signal="SIGKILL", status=status)
+        stage["output"] = stage["stdout"] + stage["stderr"]
+        return stage
+
+    def _stage(
+        self, code: Optional[int], stdout: str = "", stderr: str = ""
+    ) -> Dict[str, Any]:
+        return {
+            "code": code,
+            "signal": None,
+            "stdout": stdout,
+            "stderr": stderr,
+            "output": stdout + stderr,
+            "cpu_time": 1,
+            "memory": 1024 * 1024,
+        }
+
+    def _program_output(self, source: str, stdin: str) -> tuple[int, str, str]:
+        if "FAKE_RUNTIME_ERROR" in source:
+            return 1, "", "fake: runtime error"
+        if "FAKE_WRONG_ANSWER" in source:
+            return 0, "", ""
+        return 0, stdin, ""
+
+    def _run_once(self, source: str, stdin: str) -> Dict[str, Any]:
+        code, stdout, stderr = self._program_output(source, stdin)
+        return self._stage(code, stdout, stderr)
+
+    @staticmethod
+    def _decode_literals(literals: str) -> str:
+        # The harness writes "..." pieces with 3-digit octal escapes only
+        raw = "".join(re.findall(r'"([^"]*)"', literals))
+        data = LITERAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), raw)
+        return data.encode("latin-1").decode("utf-8", errors="replace")
+
+    def _run_batch(self, source: str, marker: str) -> Dict[str, Any]:
+        inputs: Dict[int, str] = {
+            int(match.group(1)): self._decode_literals(match.group(2))
+            for match in BATCH_INPUT.finditer(source)
+        }
+
+        stdout_parts: List[str] = []
+        stderr_parts: List[str] = []
+        for index in sorted(inputs):
+            code, stdout, stderr = self._program_output(source, inputs[index])
+            stdout_parts.append(f"{stdout}\n{marker}:{index}:E:{code}:1:1024\n")
+            stderr_parts.append(f"{stderr}\n{marker}:{index}\n")
+
+        return self._stage(0, "".join(stdout_parts), "".join(stderr_parts))
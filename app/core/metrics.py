@@ -0,0 +1,34 @@
+## in-process counters exposed on GET /metrics
+from collections import defaultdict
+from threading import Lock
+from typing import Dict
+
+
+class Metrics:
+    """
+    Minimal per-process counter/gauge registry. Good enough to compare runs
+    (benchmarks, load tests) without pulling in a metrics client.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+
+
+metrics = Metrics()
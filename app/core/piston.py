@@ -0,0 +1,290 @@
+## shared executor pool for the Piston code runners
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.config import settings
+from app.core.fake_piston import FakePiston, RunnerRejected
+from app.core.metrics import metrics
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class BackendUnavailable(Exception):
+    """No runner could take the job (all failed or circuits open)"""
+
+
+class PistonBackend(ABC):
+    """
+    One runner node. Tracks in-flight requests, a latency average from the
+    health probes and a circuit breaker over consecutive failures.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.latency = 0.0
+        self.healthy = True
+        self.failures = 0
+        self.open_until = 0.0
+        # Set while the single trial request of a half-open circuit runs
+        self.trial_in_flight = False
+
+    def half_open(self, now: float) -> bool:
+        """The circuit was opened and its reset time has passed"""
+        return self.open_until > 0 and now >= self.open_until
+
+    def available(self, now: float) -> bool:
+        # A half-open circuit admits one trial request; the rest go
+        # elsewhere until that trial closes (or reopens) it
+        if not self.healthy or now < self.open_until:
+            return False
+        return not (self.trial_in_flight and self.half_open(now))
+
+    def acquire(self, now: float) -> bool:
+        """
+        Called when a request is routed here; returns the trial token: True
+        if this request is the half-open trial
+        """
+        if self.half_open(now) and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def release(self, trial: bool) -> None:
+        """Called once the request finished, with the token acquire() gave it"""
+        if trial:
+            self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= settings.PISTON_CIRCUIT_FAILURES:
+            self.open_until = time.monotonic() + settings.PISTON_CIRCUIT_RESET
+            print(f"Piston backend {self.url} circuit open")
+
+    def record_latency(self, seconds: float) -> None:
+        # exponentially weighted, so one slow probe doesn't flip routing
+        self.latency = seconds if not self.latency else 0.8 * self.latency + 0.2 * seconds
+
+    @abstractmethod
+    async def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one Piston execute payload and return the response body"""
+
+    @abstractmethod
+    async def probe(self) -> None:
+        """Cheap request used by the health loop; raises if the node is down"""
+
+
+class HttpPistonBackend(PistonBackend):
+    """A real Piston (or compatible) runner reached over HTTP"""
+
+    def __init__(self, url: str, client: httpx.AsyncClient):
+        super().__init__(url)
+        self._client = client
+        self._runtimes_url = url.rsplit("/execute", 1)[0] + "/runtimes"
+
+    async def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self._client.post(self.url, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def probe(self) -> None:
+        response = await self._client.get(self._runtimes_url)
+        response.raise_for_status()
+
+
+class FakePistonBackend(PistonBackend):
+    """In-process fake runner, selected with a fake:// backend URL"""
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.runner = FakePiston.from_url(url)
+
+    async def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return await self.runner.execute(payload)
+        except RunnerRejected as e:
+            # Surface it like HttpPistonBackend would: a non-retryable 400
+            request = httpx.Request("POST", self.url)
+            raise httpx.HTTPStatusError(
+                str(e), request=request,
+                response=httpx.Response(400, json={"message": str(e)}, request=request),
+            ) from e
+
+    async def probe(self) -> None:
+        await self.runner.runtimes()
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Node-level failures are retried elsewhere; 4xx means a bad job"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return True
+
+
+class PistonClient:
+    """
+    Application-lifetime executor for the Piston execute API.
+
+    Holds one pooled httpx.AsyncClient (keep-alive, optional HTTP/2) shared
+    by every configured runner, a semaphore capping executions in flight,
+    and routes each job to the healthy backend with the fewest outstanding
+    requests. Failed jobs are retried on another node.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self.backends: List[PistonBackend] = []
+
+    @staticmethod
+    def backend_urls() -> List[str]:
+        urls = [url.strip() for url in settings.PISTON_BACKENDS.split(",") if url.strip()]
+        return urls or [settings.PISTON_API_URL]
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+
+        limits = httpx.Limits(
+            max_connections=settings.PISTON_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PISTON_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.PISTON_KEEPALIVE_EXPIRY,
+        )
+        http2 = settings.PISTON_HTTP2 and _http2_available()
+
+        self._client = httpx.AsyncClient(
+            limits=limits,
+            http2=http2,
+            timeout=httpx.Timeout(
+                settings.PISTON_TIMEOUT,
+                pool=settings.PISTON_POOL_TIMEOUT,
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(settings.PISTON_MAX_CONCURRENCY)
+        self.backends = [
+            FakePistonBackend(url) if url.startswith("fake://")
+            else HttpPistonBackend(url, self._client)
+            for url in self.backend_urls()
+        ]
+
+        if settings.PISTON_HEALTH_INTERVAL > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+        print(f"Piston client started ({len(self.backends)} backends, http2={http2})")
+
+    async def close(self) -> None:
+        if self._client is None:
+            return
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        await self._client.aclose()
+        self._client = None
+        self._semaphore = None
+        self.backends = []
+
+    def _pick_backend(self, exclude: List[PistonBackend]) -> Optional[PistonBackend]:
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in exclude]
+        available = [b for b in candidates if b.available(now)]
+        # If every node looks down, still try one rather than failing
+        # outright (but never pile onto a half-open node's trial)
+        pool = available or [b for b in candidates if not b.trial_in_flight]
+        if not pool:
+            return None
+        return min(pool, key=lambda b: (b.outstanding, b.latency))
+
+    async def execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a job on the least-loaded backend and return Piston's JSON body"""
+        if self._client is None:
+            # Scripts / workers that never ran the startup hook
+            await self.start()
+
+        tried: List[PistonBackend] = []
+        last_error: Optional[Exception] = None
+
+        async with self._semaphore:
+            for _ in range(1 + max(0, settings.PISTON_RETRY_ATTEMPTS)):
+                backend = self._pick_backend(tried)
+                if backend is None:
+                    break
+                tried.append(backend)
+                if len(tried) > 1:
+                    metrics.incr("piston.retries")
+
+                trial = backend.acquire(time.monotonic())
+                backend.outstanding += 1
+                metrics.incr("piston.requests")
+                try:
+                    data = await backend.execute(payload)
+                except Exception as e:
+                    metrics.incr("piston.failures")
+                    last_error = e
+                    if not _is_retryable(e):
+                        # The node answered; the job itself was bad
+                        backend.record_success()
+                        raise
+                    backend.record_failure()
+                    continue
+                finally:
+                    backend.outstanding -= 1
+                    backend.release(trial)
+
+                backend.record_success()
+                return data
+
+        raise BackendUnavailable(f"No Piston backend could run the job: {last_error}")
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*[self._probe(b) for b in self.backends])
+            await asyncio.sleep(settings.PISTON_HEALTH_INTERVAL)
+
+    async def _probe(self, backend: PistonBackend) -> None:
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(backend.probe(), timeout=settings.PISTON_POOL_TIMEOUT)
+        except Exception as e:
+            if backend.healthy:
+                print(f"Piston backend {backend.url} unhealthy: {e}")
+            backend.healthy = False
+            return
+
+        backend.record_latency(time.monotonic() - started)
+        if not backend.healthy:
+            print(f"Piston backend {backend.url} healthy again")
+        backend.healthy = True
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "url": b.url,
+                "healthy": b.healthy,
+                "circuit_open": now < b.open_until,
+                "half_open": b.half_open(now),
+                "outstanding": b.outstanding,
+                "latency_ms": round(b.latency * 1000, 1),
+            }
+            for b in self.backends
+        ]
+
+
+piston_client = PistonClient()
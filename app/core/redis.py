@@ -1,7 +1,31 @@
-import redis
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 
-redis_client = redis.Redis(
-    host="localhost",
-    port=6379,
-    decode_responses=True 
-)
\ No newline at end of file
+from app.config import settings
+
+# Single non-blocking connection pool shared by presence, pub/sub and the
+# caches. Opened/closed by the startup and shutdown hooks in app.main.
+redis_pool = aioredis.BlockingConnectionPool.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    timeout=settings.REDIS_POOL_TIMEOUT,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    decode_responses=True,
+)
+
+redis_client = aioredis.Redis(connection_pool=redis_pool)
+
+
+async def init_redis() -> None:
+    try:
+        await redis_client.ping()
+        print(" Redis connected")
+    except RedisError as e:
+        # Presence and caches degrade gracefully; don't block startup
+        print(f"Redis unavailable at startup: {e}")
+
+
+async def close_redis() -> None:
+    await redis_client.aclose()
+    await redis_pool.disconnect()
@@ -1,12 +1,66 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, TypeVar
+from cachetools import LRUCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import settings
+from app.core.metrics import metrics
+import hashlib
 import re
+import time
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Password hashing context (existing hashes keep verifying when the rounds change)
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.PASSWORD_HASH_ROUNDS,
+)
+
+# Hashing costs tens of ms of CPU per call, so it runs on a small dedicated
+# pool instead of the event loop (hashlib's pbkdf2 releases the GIL).
+# Login bursts queue here without stalling judging or websockets.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_hash_lock = threading.Lock()
+_hash_queued = 0
+_hash_running = 0
+
+T = TypeVar("T")
+
+def _update_hash_gauges(queued_delta: int, running_delta: int) -> None:
+    global _hash_queued, _hash_running
+    with _hash_lock:
+        _hash_queued += queued_delta
+        _hash_running += running_delta
+        metrics.set_gauge("password_hash.queue_depth", _hash_queued)
+        metrics.set_gauge("password_hash.running", _hash_running)
+
+async def _run_hashing(fn: Callable[..., T], *args: Any) -> T:
+    queued_at = time.perf_counter()
+
+    def job() -> T:
+        _update_hash_gauges(-1, 1)
+        metrics.incr("password_hash.wait_seconds", time.perf_counter() - queued_at)
+        try:
+            return fn(*args)
+        finally:
+            _update_hash_gauges(0, -1)
+
+    def discard_if_cancelled(future) -> None:
+        # Cancelled before a worker picked it up: job() never ran
+        if future.cancelled():
+            _update_hash_gauges(-1, 0)
+
+    metrics.incr("password_hash.calls")
+    _update_hash_gauges(1, 0)
+    future = _hash_executor.submit(job)
+    future.add_done_callback(discard_if_cancelled)
+    return await asyncio.wrap_future(future)
 
 def validate_password_strength(password: str) -> None:
     """Validate password strength"""
@@ -28,6 +82,15 @@ def get_password_hash(password: str) -> str:
     validate_password_strength(password)
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool"""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing pool (validation errors still raise ValueError)"""
+    validate_password_strength(password)
+    return await _run_hashing(pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -40,10 +103,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+# Verified tokens: sha256(token) -> decoded payload. Clients send the same
+# cookie on every request, so the signature check and claim parsing run
+# once per token; `exp` is still enforced on every hit.
+_verified_tokens: LRUCache = LRUCache(maxsize=settings.TOKEN_CACHE_MAX_ENTRIES)
+
 def verify_token(token: str) -> Optional[Dict[str, Any]]:
     """Verify JWT token and return payload"""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = _verified_tokens.get(key)
+    if payload is not None:
+        exp = payload.get("exp")
+        if exp is None or exp > time.time():
+            metrics.incr("auth.token_cache.hit")
+            return payload
+        _verified_tokens.pop(key, None)
+        metrics.incr("auth.token_cache.expired")
+        return None
+
+    metrics.incr("auth.token_cache.miss")
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    _verified_tokens[key] = payload
+    return payload
\ No newline at end of file
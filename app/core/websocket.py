@@ -1,10 +1,12 @@
+import asyncio
 from fastapi import WebSocket, WebSocketDisconnect, status
+from app.config import settings
 from app.core.security import verify_token
-from app.services.auth_service import AuthService
-from app.database import get_db
-from app.core.ws_manager import ConnectionManager
-
-manager = ConnectionManager()
+from app.core.ws_connection import CURRENT_PROTOCOL, negotiate_protocol
+from app.core.ws_router import router as ws_router
+from app.services import user_status_cache
+from app.services.last_seen_service import last_seen_writer
+from app.core.ws_manager import manager
 
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
@@ -24,21 +26,49 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
-    async for db in get_db():
-        user = await AuthService.get_user_by_id(db, int(user_id))
-        if not user:
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            return
+    # The token is already verified; existence/active status comes from the
+    # shared user status cache, so a connect normally costs no DB query
+    user_id = int(user_id)
+    if not await user_status_cache.is_user_active(user_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
 
-    await manager.connect(user.user_id, websocket)
+    # Existing clients don't send ?protocol=2 and keep the original frames
+    protocol = negotiate_protocol(websocket.query_params.get("protocol"))
+    connection = await manager.connect(user_id, websocket, protocol)
+    last_seen_writer.record_seen(user_id)
+    if protocol >= CURRENT_PROTOCOL:
+        connection.send({
+            "type": "welcome",
+            "message": "Authenticated",
+            "user_id": user_id,
+            "protocol": protocol,
+        })
 
     try:
         while True:
-            data = await websocket.receive_text()
-            await websocket.send_json({
-                "message": "Authenticated",
-                "user_id": user.user_id,
-            })
+            if protocol >= CURRENT_PROTOCOL:
+                # Silence past the timeout (not even a pong to our pings)
+                # means the peer is gone
+                data = await asyncio.wait_for(
+                    websocket.receive_text(), timeout=settings.WS_PING_TIMEOUT
+                )
+            else:
+                # Liveness comes from the server's websocket-level pings
+                data = await websocket.receive_text()
+            last_seen_writer.record_seen(user_id)
+            if protocol >= CURRENT_PROTOCOL:
+                await ws_router.dispatch(connection, data)
+            else:
+                connection.send({
+                    "message": "Authenticated",
+                    "user_id": user_id,
+                })
     except WebSocketDisconnect:
-        manager.disconnect(user.user_id)
         print("WebSocket disconnected")
+    except asyncio.TimeoutError:
+        print(f"WebSocket of user {user_id} timed out")
+        await websocket.close(code=status.WS_1001_GOING_AWAY)
+    finally:
+        # Also runs when the socket dies without a clean close frame
+        await manager.disconnect(user_id, connection.connection_id)
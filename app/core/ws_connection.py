@@ -0,0 +1,152 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fastapi import WebSocket
+
+from app.config import settings
+from app.core.metrics import metrics
+
+# --------------------------
+# Outbound queue per websocket
+# --------------------------
+# Fan-out never awaits a client: messages go into a bounded queue that a
+# per-connection writer drains. Low-priority messages carry a coalescing
+# key (newer replaces the queued one) and are the first to go when the
+# queue is full. A client that can't even keep up with high-priority
+# messages is disconnected so it can reconnect and resync.
+
+# message type -> fields that identify what it is an update *of*
+LOW_PRIORITY_MESSAGES: Dict[str, Tuple[str, ...]] = {
+    "judge_progress": ("submission_id",),
+    "presence": ("user_id",),
+    "ping": (),
+}
+
+# 1013 = "try again later": the client fell too far behind
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Client protocol versions (/ws?protocol=N):
+#   1  the original one, the default: every inbound frame is answered with
+#      {"message": "Authenticated", "user_id": ...}; no app-level pings
+#   2  typed JSON messages (app.core.ws_router), a "welcome" frame on
+#      connect, app-level ping/pong and the WS_PING_TIMEOUT idle timeout
+LEGACY_PROTOCOL = 1
+CURRENT_PROTOCOL = 2
+
+
+def negotiate_protocol(requested: Optional[str]) -> int:
+    """Unknown or missing versions get the legacy protocol"""
+    try:
+        version = int(requested) if requested is not None else LEGACY_PROTOCOL
+    except ValueError:
+        return LEGACY_PROTOCOL
+    return CURRENT_PROTOCOL if version >= CURRENT_PROTOCOL else LEGACY_PROTOCOL
+
+
+def coalesce_key(message: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """None for high-priority messages (never dropped or merged)"""
+    message_type = message.get("type")
+    fields = LOW_PRIORITY_MESSAGES.get(message_type)
+    if fields is None:
+        return None
+    return (message_type, *(message.get(name) for name in fields))
+
+
+class Connection:
+    """One websocket plus its bounded outbound queue and writer task"""
+
+    def __init__(
+        self,
+        user_id: int,
+        connection_id: str,
+        websocket: WebSocket,
+        protocol: int = LEGACY_PROTOCOL,
+    ):
+        self.user_id = user_id
+        self.connection_id = connection_id
+        self.websocket = websocket
+        self.protocol = protocol
+        self.closed = False
+        # entries are [coalesce key, message] so coalescing can swap in place
+        self._queue: Deque[List[Any]] = deque()
+        self._pending: Dict[Tuple[Any, ...], List[Any]] = {}
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write())
+
+    async def stop(self) -> None:
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        if self._closer is not None:
+            # Let an in-flight close frame go out; it is short and bounded
+            await asyncio.gather(self._closer, return_exceptions=True)
+            self._closer = None
+
+    def send(self, message: Dict[str, Any]) -> bool:
+        """Queues a message without waiting; False if it was dropped"""
+        if self.closed:
+            return False
+
+        key = coalesce_key(message)
+        if key is not None and key in self._pending:
+            self._pending[key][1] = message
+            metrics.incr("ws.coalesced")
+            return True
+
+        if len(self._queue) >= settings.WS_SEND_QUEUE_SIZE:
+            if key is not None:
+                metrics.incr("ws.dropped")
+                return False
+            if not self._evict_low_priority():
+                metrics.incr("ws.slow_consumer")
+                print(f"Closing slow websocket of user {self.user_id} ({self.connection_id})")
+                self.closed = True
+                self._closer = asyncio.create_task(self._close(SLOW_CONSUMER_CLOSE_CODE))
+                return False
+
+        entry = [key, message]
+        self._queue.append(entry)
+        if key is not None:
+            self._pending[key] = entry
+        self._ready.set()
+        return True
+
+    def _evict_low_priority(self) -> bool:
+        for entry in self._queue:
+            if entry[0] is not None:
+                self._queue.remove(entry)
+                del self._pending[entry[0]]
+                metrics.incr("ws.dropped")
+                return True
+        return False
+
+    async def _write(self) -> None:
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                key, message = self._queue.popleft()
+                if key is not None:
+                    self._pending.pop(key, None)
+                try:
+                    await self.websocket.send_json(message)
+                    metrics.incr("ws.delivered")
+                except Exception as e:
+                    print(f"Failed to send to user {self.user_id}: {e}")
+                    self.closed = True
+                    return
+            self._ready.clear()
+
+    async def _close(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except Exception as e:
+            # Usually the peer is already gone; the endpoint cleans up
+            print(f"Failed to close websocket of user {self.user_id}: {e}")
@@ -1,27 +1,249 @@
+import asyncio
+import json
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
 from fastapi import WebSocket
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.core.metrics import metrics
 from app.core.redis import redis_client
+from app.core.ws_connection import CURRENT_PROTOCOL, LEGACY_PROTOCOL, Connection
+from app.services.webSocket import presence_service
+
+# --------------------------
+# Cross-process fan-out
+# --------------------------
+# Users are spread over WS_CHANNEL_SHARDS Redis channels (user_id % shards).
+# Each process runs one subscriber that only listens to the shards of the
+# users whose sockets it holds, plus the broadcast channel. Sends are
+# delivered to local sockets straight away and buffered for
+# WS_BATCH_WINDOW seconds, then published as one message per shard in a
+# single pipeline. A process skips its own messages when they come back.
+SHARD_CHANNEL = "ws:shard:{shard}"
+BROADCAST_CHANNEL = "ws:broadcast"
 
-ONLINE_USERS_KEY = "online_users"
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: dict[int, WebSocket] = {}
+        # user_id -> {connection_id: connection}; one entry per tab
+        self.active_connections: dict[int, dict[str, Connection]] = {}
+        self.process_id = uuid.uuid4().hex
+        self._tasks: list[asyncio.Task] = []
+        self._pubsub: Optional[PubSub] = None
+        self._shard_users: Dict[int, int] = defaultdict(int)
+        self._outbox: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def connect(
+        self, user_id: int, websocket: WebSocket, protocol: int = LEGACY_PROTOCOL
+    ) -> Connection:
+        connection = Connection(user_id, uuid.uuid4().hex, websocket, protocol)
+        connection_id = connection.connection_id
+        connection.start()
+        sockets = self.active_connections.setdefault(user_id, {})
+        first_socket = not sockets
+        sockets[connection_id] = connection
+        if first_socket:
+            await self._hold_shard(user_id)
+
+        try:
+            await presence_service.add_connection(user_id, connection_id)
+            print(f"User {user_id} connected ({connection_id})")
+        except RedisError as e:
+            print(f"Failed to mark user {user_id} online: {e}")
+        return connection
+
+    async def disconnect(self, user_id: int, connection_id: str):
+        sockets = self.active_connections.get(user_id, {})
+        connection = sockets.pop(connection_id, None)
+        if connection is not None:
+            await connection.stop()
+        if not sockets and self.active_connections.pop(user_id, None) is not None:
+            await self._release_shard(user_id)
+
+        try:
+            remaining = await presence_service.remove_connection(user_id, connection_id)
+            print(f"User {user_id} disconnected ({remaining} connections left)")
+        except RedisError as e:
+            # The entry expires on its own once heartbeats stop
+            print(f"Failed to mark user {user_id} offline: {e}")
+
+    async def is_online(self, user_id: int) -> bool:
+        return await presence_service.is_user_online(user_id)
+
+    # --------------------------
+    # Send API (works from any process, including standalone judges)
+    # --------------------------
+    async def send_to_user(self, user_id: int, message: Dict[str, Any]) -> None:
+        await self.send_to_users([user_id], message)
+
+    async def send_to_users(self, user_ids: Iterable[int], message: Dict[str, Any]) -> None:
+        by_shard: Dict[int, List[int]] = defaultdict(list)
+        for user_id in dict.fromkeys(user_ids):
+            by_shard[self._shard_of(user_id)].append(user_id)
+        if not by_shard:
+            return
+
+        for shard, ids in by_shard.items():
+            self._outbox[SHARD_CHANNEL.format(shard=shard)].append(
+                {"user_ids": ids, "message": message}
+            )
+        self._schedule_flush()
+
+        await self._deliver([uid for ids in by_shard.values() for uid in ids], message)
+
+    async def broadcast(self, message: Dict[str, Any]) -> None:
+        self._outbox[BROADCAST_CHANNEL].append({"user_ids": None, "message": message})
+        self._schedule_flush()
+        await self._deliver(None, message)
+
+    async def flush(self) -> None:
+        """Publishes everything buffered, one message per channel"""
+        outbox, self._outbox = self._outbox, defaultdict(list)
+        if not outbox:
+            return
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for channel, items in outbox.items():
+                    pipe.publish(channel, json.dumps({"origin": self.process_id, "items": items}))
+                await pipe.execute()
+            metrics.incr("ws.published", len(outbox))
+        except RedisError as e:
+            print(f"Failed to publish websocket messages: {e}")
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.WS_BATCH_WINDOW)
+        await self.flush()
+
+    async def _deliver(self, user_ids: Optional[List[int]], message: Dict[str, Any]) -> None:
+        """Queues for the matching sockets held by this process (None = all)"""
+        if user_ids is None:
+            targets = list(self.active_connections.values())
+        else:
+            targets = [
+                self.active_connections[uid]
+                for uid in user_ids
+                if uid in self.active_connections
+            ]
+        for sockets in targets:
+            for connection in list(sockets.values()):
+                connection.send(message)
+
+    # --------------------------
+    # Subscriptions
+    # --------------------------
+    @staticmethod
+    def _shard_of(user_id: int) -> int:
+        return user_id % settings.WS_CHANNEL_SHARDS
+
+    def _subscribed_channels(self) -> List[str]:
+        return [BROADCAST_CHANNEL] + [
+            SHARD_CHANNEL.format(shard=shard) for shard in self._shard_users
+        ]
+
+    async def _hold_shard(self, user_id: int) -> None:
+        shard = self._shard_of(user_id)
+        self._shard_users[shard] += 1
+        if self._shard_users[shard] == 1 and self._pubsub is not None:
+            try:
+                await self._pubsub.subscribe(SHARD_CHANNEL.format(shard=shard))
+            except RedisError as e:
+                # The listener resubscribes to every held shard on reconnect
+                print(f"Failed to subscribe to shard {shard}: {e}")
+
+    async def _release_shard(self, user_id: int) -> None:
+        shard = self._shard_of(user_id)
+        self._shard_users[shard] -= 1
+        if self._shard_users[shard] > 0:
+            return
+        del self._shard_users[shard]
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(SHARD_CHANNEL.format(shard=shard))
+            except RedisError as e:
+                print(f"Failed to unsubscribe from shard {shard}: {e}")
+
+    # --------------------------
+    # Background tasks
+    # --------------------------
+    async def start(self) -> None:
+        """Starts the shard subscriber, the presence heartbeat and app pings"""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._listen()),
+                asyncio.create_task(self._heartbeat()),
+                asyncio.create_task(self._ping()),
+            ]
 
-    async def connect(self, user_id: int, websocket: WebSocket):
-        self.active_connections[user_id] = websocket
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
 
-        redis_client.sadd(ONLINE_USERS_KEY, user_id)
+    async def _heartbeat(self) -> None:
+        """Keeps this process' connections alive and expires everyone else's stale ones"""
+        while True:
+            await asyncio.sleep(settings.PRESENCE_HEARTBEAT_INTERVAL)
+            try:
+                await presence_service.refresh_connections([
+                    (user_id, connection_id)
+                    for user_id, sockets in list(self.active_connections.items())
+                    for connection_id in list(sockets)
+                ])
+                await presence_service.sweep_expired()
+            except RedisError as e:
+                print(f"Presence heartbeat failed: {e}")
 
-        print(f"User {user_id} connected")
-        print("Online users (Redis):", redis_client.smembers(ONLINE_USERS_KEY))
+    async def _ping(self) -> None:
+        """
+        App-level pings for protocol 2 clients. Live clients answer with a
+        pong, which keeps the endpoint's receive timeout (WS_PING_TIMEOUT)
+        from firing on idle but healthy sockets; dead peers stay silent and
+        get dropped. Legacy clients don't know the frame and are left to
+        the server's websocket-level ping/pong.
+        """
+        while True:
+            await asyncio.sleep(settings.WS_PING_INTERVAL)
+            for sockets in list(self.active_connections.values()):
+                for connection in list(sockets.values()):
+                    if connection.protocol >= CURRENT_PROTOCOL:
+                        connection.send({"type": "ping"})
 
-    def disconnect(self, user_id: int):
-        self.active_connections.pop(user_id, None)
+    async def _listen(self) -> None:
+        """Single subscriber per process: relays shard/broadcast messages to local sockets"""
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                self._pubsub = pubsub
+                try:
+                    await pubsub.subscribe(*self._subscribed_channels())
+                    async for item in pubsub.listen():
+                        await self._dispatch(item["data"])
+                finally:
+                    self._pubsub = None
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WebSocket listener error, resubscribing: {e}")
+                await asyncio.sleep(1)
 
-        redis_client.srem(ONLINE_USERS_KEY, user_id)
+    async def _dispatch(self, data: str) -> None:
+        payload = json.loads(data)
+        if payload.get("origin") == self.process_id:
+            return  # already delivered locally when it was sent
+        for item in payload["items"]:
+            await self._deliver(item["user_ids"], item["message"])
 
-        print(f"User {user_id} disconnected")
-        print("Online users (Redis):", redis_client.smembers(ONLINE_USERS_KEY))
 
-    def is_online(self, user_id: int) -> bool:
-        return redis_client.sismember(ONLINE_USERS_KEY, user_id)
+manager = ConnectionManager()
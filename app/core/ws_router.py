@@ -0,0 +1,88 @@
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.core.ws_connection import Connection
+from app.schemas.websocket import PingMessage, PongMessage, PresenceQueryMessage
+from app.services.webSocket import presence_service
+
+# A handler gets the validated message and may return a reply to queue
+MessageHandler = Callable[[Connection, Any], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class MessageRouter:
+    """Routes inbound JSON frames to handlers by their "type" field"""
+
+    def __init__(self):
+        self._routes: Dict[str, Tuple[Type[BaseModel], MessageHandler]] = {}
+
+    def on(self, message_type: str, model: Type[BaseModel]):
+        def register(handler: MessageHandler) -> MessageHandler:
+            self._routes[message_type] = (model, handler)
+            return handler
+        return register
+
+    async def dispatch(self, connection: Connection, raw: str) -> None:
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            connection.send(_error("Messages must be JSON"))
+            return
+        if not isinstance(data, dict):
+            connection.send(_error("Messages must be JSON objects"))
+            return
+
+        route = self._routes.get(data.get("type"))
+        if route is None:
+            connection.send(_error(f"Unknown message type: {data.get('type')}"))
+            return
+
+        model, handler = route
+        try:
+            message = model.model_validate(data)
+        except ValidationError as e:
+            connection.send(_error(f"Invalid {data['type']} message", e.errors()))
+            return
+
+        try:
+            reply = await handler(connection, message)
+        except Exception as e:
+            print(f"WebSocket handler for {data['type']} failed: {e}")
+            connection.send(_error("Internal error"))
+            return
+        if reply is not None:
+            connection.send(reply)
+
+
+def _error(detail: str, errors: Any = None) -> Dict[str, Any]:
+    message: Dict[str, Any] = {"type": "error", "detail": detail}
+    if errors is not None:
+        message["errors"] = json.loads(json.dumps(errors, default=str))
+    return message
+
+
+router = MessageRouter()
+
+
+@router.on("ping", PingMessage)
+async def handle_ping(connection: Connection, message: PingMessage):
+    return {"type": "pong"}
+
+
+@router.on("pong", PongMessage)
+async def handle_pong(connection: Connection, message: PongMessage):
+    # Receiving anything already resets the endpoint's idle timeout
+    return None
+
+
+@router.on("presence.query", PresenceQueryMessage)
+async def handle_presence_query(connection: Connection, message: PresenceQueryMessage):
+    status = await presence_service.get_online_status(message.user_ids)
+    return {
+        "type": "presence.status",
+        "users": [
+            {"user_id": user_id, "online": online}
+            for user_id, online in status.items()
+        ],
+    }
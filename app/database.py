@@ -1,17 +1,74 @@
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from app.config import settings
+from app.core.metrics import metrics
 
 class Base(DeclarativeBase):
     pass
 
 
-def create_database_engine():
-    """Create database engine with connection pooling for performance"""
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Default async pool, plus checkout counters on GET /metrics:
+      db.pool.checkouts / wait_seconds / waits  - getting a connection
+      db.pool.hold_seconds                      - how long it was kept
+      db.pool.checked_out / overflow (gauges)   - current usage
+    """
+
+    metric_prefix = "db.pool"
+
+    def _do_get(self):
+        # Every connection (pool + overflow) is taken: this checkout blocks
+        exhausted = 0 <= self._max_overflow and (
+            self.checkedout() >= self.size() + self._max_overflow
+        )
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.incr(f"{self.metric_prefix}.checkouts")
+            metrics.incr(f"{self.metric_prefix}.wait_seconds", time.perf_counter() - started)
+            if exhausted:
+                metrics.incr(f"{self.metric_prefix}.waits")
+            self._report_usage()
+
+    def _do_return_conn(self, record):
+        try:
+            super()._do_return_conn(record)
+        finally:
+            self._report_usage()
+
+    def _report_usage(self):
+        metrics.set_gauge(f"{self.metric_prefix}.checked_out", self.checkedout())
+        metrics.set_gauge(f"{self.metric_prefix}.overflow", max(self.overflow(), 0))
+
+
+class ReplicaQueuePool(InstrumentedQueuePool):
+    """Same counters for the read replica, under db.replica_pool.*"""
+
+    metric_prefix = "db.replica_pool"
 
-    # ❗ USE SETTINGS, NOT os.getenv
-    database_url = settings.DATABASE_URL
 
+def _instrument_hold_time(engine, metric_prefix: str = "db.pool") -> None:
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            metrics.incr(f"{metric_prefix}.hold_seconds", time.perf_counter() - started)
+
+
+def _asyncpg_url(database_url: str) -> str:
     # Convert sync style to asyncpg
     database_url = database_url.replace("postgresql://", "postgresql+asyncpg://")
 
@@ -20,20 +77,75 @@ def create_database_engine():
 
     # Convert sslmode=require → ssl=require for asyncpg
     database_url = database_url.replace("sslmode=require", "ssl=require")
+    return database_url
+
+
+def _engine_options(pool_size: int, max_overflow: int, poolclass) -> Dict[str, Any]:
+    """
+    Pool and asyncpg options from settings. In DB_PGBOUNCER mode pgbouncer
+    does the pooling (transaction mode), so connections aren't pooled here
+    and prepared statements can't be reused: a statement prepared on one
+    server connection may be executed on another.
+    """
+    if settings.DB_PGBOUNCER:
+        return {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            },
+        }
+
+    return {
+        "poolclass": poolclass,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {
+            # asyncpg's own cache and SQLAlchemy's prepared statement cache
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    }
 
 
+def create_database_engine():
+    """Create database engine with connection pooling for performance"""
+
+    # ❗ USE SETTINGS, NOT os.getenv
+    database_url = _asyncpg_url(settings.DATABASE_URL)
+
     #print("DATABASE URL (DATABASE.PY) →", database_url)
 
     return create_async_engine(
         database_url,
         echo=False,
-        pool_size=20,
-        max_overflow=30,
-        pool_pre_ping=True
+        **_engine_options(settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, InstrumentedQueuePool),
+    )
+
+
+def create_replica_engine():
+    """Engine for DATABASE_REPLICA_URL, or None when no replica is configured"""
+    if not settings.DATABASE_REPLICA_URL:
+        return None
+    return create_async_engine(
+        _asyncpg_url(settings.DATABASE_REPLICA_URL),
+        echo=False,
+        **_engine_options(
+            settings.DB_REPLICA_POOL_SIZE, settings.DB_REPLICA_MAX_OVERFLOW, ReplicaQueuePool
+        ),
     )
 
 
 engine = create_database_engine()
+_instrument_hold_time(engine)
+
+replica_engine = create_replica_engine()
+if replica_engine is not None:
+    _instrument_hold_time(replica_engine, ReplicaQueuePool.metric_prefix)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -42,9 +154,54 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+# Read-only sessions; the primary when there is no replica
+ReadSessionLocal = async_sessionmaker(
+    bind=replica_engine or engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
+)
+
 
 async def get_db():
-    """Dependency to get database session"""
+    """
+    Dependency to get database session. The session only checks out a
+    connection on its first query and keeps it until the request ends, so
+    endpoints that wait on external services (Piston, Cloudinary) should
+    use unit_of_work() around their SQL instead.
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def get_read_db():
+    """
+    Dependency for read-only routes: a session on the read replica, or on
+    the primary when DATABASE_REPLICA_URL isn't set. Nothing is committed;
+    replica reads may lag the primary slightly, so don't use it to read
+    back something the same client has just written.
+    """
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.rollback()
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """
+    Short-lived session: commits on success, rolls back on error, and gives
+    the pooled connection back as soon as the block exits.
+
+        async with unit_of_work() as db:
+            db.add(row)
+    """
     async with AsyncSessionLocal() as session:
         try:
             yield session
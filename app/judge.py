@@ -0,0 +1,52 @@
+"""
+Standalone judge worker process.
+
+    python -m app.judge [--workers N]
+
+Drains the submission queue independently of the API so judge throughput
+can be scaled separately (set JUDGE_WORKERS=0 on the API instances to keep
+all judging here).
+"""
+import argparse
+import asyncio
+
+from app.config import settings
+from app.core.piston import piston_client
+from app.core.redis import close_redis, init_redis
+from app.core.ws_manager import manager
+from app.database import engine
+from app.services.judge_queue import JudgeWorkerPool
+
+
+async def main(workers: int) -> None:
+    pool = JudgeWorkerPool(workers)
+
+    await init_redis()
+    await piston_client.start()
+    await pool.start()
+    try:
+        # Run until cancelled (Ctrl+C / SIGTERM)
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+        # Publish any judge updates still waiting in the batch window
+        await manager.flush()
+        await piston_client.close()
+        await close_redis()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CodeRed judge worker")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, settings.JUDGE_WORKERS),
+        help="number of concurrent judge tasks",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -3,11 +3,16 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.models.user import User
 from app.models.submission import Submission
-from app.core.websocket import websocket_endpoint
+from app.core.websocket import manager, websocket_endpoint
 import app.core.cloudinary
 
 from app.config import settings
 from app.database import engine, Base
+from app.core.metrics import metrics
+from app.core.piston import piston_client
+from app.core.redis import close_redis, init_redis
+from app.services.judge_queue import judge_pool
+from app.services.last_seen_service import last_seen_writer
 
 
 def create_application() -> FastAPI:
@@ -99,6 +104,22 @@ def setup_events(app: FastAPI) -> None:
             await conn.run_sync(Base.metadata.create_all)
         print(" Database tables created successfully")
 
+        await init_redis()
+        await piston_client.start()
+        await manager.start()
+        await last_seen_writer.start()
+
+        if settings.JUDGE_WORKERS > 0:
+            await judge_pool.start()
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        await judge_pool.stop()
+        await manager.stop()
+        await last_seen_writer.stop()
+        await piston_client.close()
+        await close_redis()
+
     @app.get("/")
     async def root():
         return {
@@ -111,6 +132,10 @@ def setup_events(app: FastAPI) -> None:
     async def health_check():
         return {"status": "healthy", "service": "CodeForge API"}
 
+    @app.get("/metrics")
+    async def get_metrics():
+        return {**metrics.snapshot(), "piston_backends": piston_client.status()}
+
 app = create_application()
 
 app.add_api_websocket_route("/ws",websocket_endpoint)
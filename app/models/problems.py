@@ -20,4 +20,5 @@ class Problems(Base):
     is_active = Column(Boolean,default=True,nullable=False)
     test_cases = relationship("TestCases",back_populates="problem",cascade="all, delete-orphan")
     created_at = Column(DateTime(timezone=True),server_default=func.now())
-    updated_at = Column(DateTime(timezone=True),server_default=func.now())
\ No newline at end of file
+    # Also part of the test case cache version (app.services.test_case_cache)
+    updated_at = Column(DateTime(timezone=True),server_default=func.now(),onupdate=func.now())
\ No newline at end of file
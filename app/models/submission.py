@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime,TEXT,Float,ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime,TEXT,Float,ForeignKey,Index
+from sqlalchemy.sql import func, text
 from app.database import Base
 
 class Submission(Base):
     __tablename__ = "submission"
+    # Judge queue lookups (app.services.judge_queue); same as
+    # documents/migrations/submission_claimed_at.sql
+    __table_args__ = (
+        Index("idx_submission_queued", "submission_id",
+              postgresql_where=text("verdict = 'Queued'")),
+        Index("idx_submission_judging_claimed_at", "claimed_at",
+              postgresql_where=text("verdict = 'Judging'")),
+    )
 
     submission_id = Column(Integer,primary_key=True,index=True)
     # foreign key relationship
@@ -22,4 +30,7 @@ class Submission(Base):
     error_message = Column(TEXT,nullable=True)
     is_final_submission = Column(Boolean,default=False)
     submitted_at = Column(DateTime(timezone=True),server_default=func.now())
-    judged_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    judged_at = Column(DateTime(timezone=True), server_default=func.now())
+    # When a judge worker took it (refreshed while judging); see
+    # app.services.judge_queue and documents/migrations/submission_claimed_at.sql
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
\ No newline at end of file
@@ -13,4 +13,5 @@ class TestCases(Base):
     test_cases = Column(JSONB, nullable=False)
     problem = relationship("Problems",back_populates = "test_cases")
     created_at = Column(DateTime(timezone=True),server_default=func.now())
-    updated_at = Column(DateTime(timezone=True),server_default=func.now())
\ No newline at end of file
+    # Also the test case cache version (app.services.test_case_cache)
+    updated_at = Column(DateTime(timezone=True),server_default=func.now(),onupdate=func.now())
\ No newline at end of file
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, DECIMAL, Date, Text
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -45,6 +46,9 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), 
                        onupdate=func.now(), nullable=False)
     last_login = Column(DateTime(timezone=True), nullable=True)
+    # Written in bulk by app.services.last_seen_service; deferred so loads
+    # don't pay for it (see documents/migrations/users_last_seen.sql)
+    last_seen = deferred(Column(DateTime(timezone=True), nullable=True))
     email_verified_at = Column(DateTime(timezone=True), nullable=True)
 
     def __repr__(self) -> str:
@@ -85,6 +85,7 @@ class SubmissionResponse(SubmissionBase):
 
     test_cases_passed: Optional[int] = None
     total_test_cases: Optional[int] = None
+    error_message: Optional[str] = None
 
     submitted_at: datetime
     judged_at: Optional[datetime] = None
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+# Inbound websocket messages: JSON objects with a "type" field, routed by
+# app.core.ws_router.
+
+class WSMessage(BaseModel):
+    """Base for every inbound message"""
+    type: str
+
+
+class PingMessage(WSMessage):
+    """Client-initiated keepalive; answered with {"type": "pong"}"""
+
+
+class PongMessage(WSMessage):
+    """Reply to a server ping"""
+
+
+class PresenceQueryMessage(WSMessage):
+    """Ask which of these users are online"""
+    user_ids: List[int] = Field(..., max_length=500)
@@ -3,11 +3,17 @@ from sqlalchemy import select
 from typing import Tuple, Optional
 
 from app.models.user import User
+from app.services.last_seen_service import last_seen_writer
 from app.schemas.user import UserCreate
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import verify_password_async, get_password_hash_async, create_access_token
 from datetime import timedelta
 
 
+EMAIL_ALREADY_REGISTERED = "User already exists. Please login instead."
+USER_NOT_FOUND = "User not found. Please register first."
+INCORRECT_PASSWORD = "Incorrect password"
+
+
 class AuthService:
     """Authentication service handling user registration and login"""
     
@@ -20,10 +26,10 @@ class AuthService:
                 select(User).where(User.email == user_data.email)
             )
             if existing_user.scalar_one_or_none():
-                return None, "Email already registered"
+                return None, EMAIL_ALREADY_REGISTERED
             
             # Create new user with proper hashing
-            hashed_password = get_password_hash(user_data.password)
+            hashed_password = await get_password_hash_async(user_data.password)
             
             user = User(
                 username=user_data.username,  # Can be None initially
@@ -51,20 +57,23 @@ class AuthService:
             return None, f"Registration failed: {str(e)}"
 
     @staticmethod
-    async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
-        """Authenticate user with email and password"""
-        try:
-            result = await db.execute(select(User).where(User.email == email))
-            user = result.scalar_one_or_none()
-            
-            if not user or not verify_password(password, user.password_hash):
-                return None
-            
-            return user
-            
-        except Exception as e:
-            print(f"Authentication error: {e}")
-            return None
+    async def login_user(db: AsyncSession, email: str, password: str) -> Tuple[Optional[User], Optional[str]]:
+        """
+        Login in one lookup: load the user by email, verify the password and
+        queue the last_login stamp on the write-behind buffer. Returns (user, error).
+        """
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalar_one_or_none()
+        if not user:
+            return None, USER_NOT_FOUND
+
+        # OAuth-only accounts have no password hash
+        if not user.password_hash or not await verify_password_async(password, user.password_hash):
+            return None, INCORRECT_PASSWORD
+
+        # Written in bulk a few seconds later
+        last_seen_writer.record_login(user.user_id)
+        return user, None
 
     @staticmethod
     def create_user_tokens(user_id: int) -> dict:
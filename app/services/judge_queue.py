@@ -0,0 +1,184 @@
+import asyncio
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.submission import Submission
+from app.services import submission_service
+
+# --------------------------
+# Judge queue
+# --------------------------
+# The submission table is the queue: Submit inserts a row with verdict
+# "Queued", workers claim rows with SELECT ... FOR UPDATE SKIP LOCKED so any
+# number of workers (in the API process or `python -m app.judge`) can drain
+# it without ever judging the same row twice. A claim stamps claimed_at
+# (database clock) and the worker keeps refreshing it while it judges, so
+# only claims nobody has touched for JUDGE_STALE_SECONDS are put back.
+
+QUEUED = "Queued"
+JUDGING = "Judging"
+
+# Wakes in-process workers as soon as something is queued; standalone
+# workers fall back to polling every JUDGE_POLL_INTERVAL seconds.
+_wakeup = asyncio.Event()
+
+
+def notify() -> None:
+    _wakeup.set()
+
+
+async def claim_next_submission() -> Optional[Submission]:
+    """Atomically move the oldest queued submission to "Judging" and return it"""
+    async with AsyncSessionLocal() as db:
+        oldest_queued = (
+            select(Submission.submission_id)
+            .where(Submission.verdict == QUEUED)
+            .order_by(Submission.submission_id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(Submission)
+            .where(Submission.submission_id == oldest_queued)
+            .values(verdict=JUDGING, claimed_at=func.now())
+            .returning(Submission)
+        )
+        submission = result.scalar_one_or_none()
+        await db.commit()
+        return submission
+
+
+async def refresh_claim(submission_id: int) -> None:
+    """Marks a claim as still being worked on"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Submission)
+            .where(Submission.submission_id == submission_id, Submission.verdict == JUDGING)
+            .values(claimed_at=func.now())
+        )
+        await db.commit()
+
+
+async def requeue_stale_submissions() -> int:
+    """
+    Puts submissions whose claim hasn't been refreshed for
+    JUDGE_STALE_SECONDS (crashed or stuck worker) back on the queue.
+    """
+    cutoff = func.now() - timedelta(seconds=settings.JUDGE_STALE_SECONDS)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(Submission)
+            .where(
+                Submission.verdict == JUDGING,
+                or_(
+                    Submission.claimed_at < cutoff,
+                    # claimed before claimed_at existed
+                    and_(Submission.claimed_at.is_(None), Submission.submitted_at < cutoff),
+                ),
+            )
+            .values(verdict=QUEUED, claimed_at=None)
+        )
+        await db.commit()
+        return result.rowcount or 0
+
+
+class JudgeWorkerPool:
+    """A fixed number of asyncio tasks draining the judge queue"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._stopping = False
+
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.size)
+        ]
+        self._tasks.append(asyncio.create_task(self._requeue_loop()))
+        print(f"Judge worker pool started ({self.size} workers)")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, worker_id: int) -> None:
+        while not self._stopping:
+            try:
+                submission = await claim_next_submission()
+            except Exception as e:
+                print(f"[judge-{worker_id}] Failed to claim submission: {e}")
+                submission = None
+
+            if submission is None:
+                await self._wait_for_work()
+                continue
+
+            heartbeat = asyncio.create_task(self._keep_claim(submission.submission_id))
+            try:
+                await submission_service.judge_submission(submission)
+            except Exception as e:
+                print(f"[judge-{worker_id}] Submission {submission.submission_id} failed: {e}")
+                await self._fail(submission, e)
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _fail(self, submission: Submission, error: Exception) -> None:
+        """
+        Gives a submission that broke the judge a System Error instead of
+        requeueing it, so one that always fails can't loop forever. If even
+        that write fails, the stale claim is requeued later.
+        """
+        try:
+            await submission_service.record_verdict(submission, {
+                "verdict": "System Error",
+                "error_message": f"Judging failed: {error}",
+                "test_cases_passed": 0,
+                "execution_time": 0.0,
+                "memory_used": 0,
+            })
+        except Exception as e:
+            print(f"Failed to record System Error for submission {submission.submission_id}: {e}")
+
+    async def _keep_claim(self, submission_id: int) -> None:
+        """Refreshes claimed_at well within JUDGE_STALE_SECONDS while judging"""
+        while True:
+            await asyncio.sleep(settings.JUDGE_STALE_SECONDS / 3)
+            try:
+                await refresh_claim(submission_id)
+            except Exception as e:
+                print(f"Failed to refresh claim on submission {submission_id}: {e}")
+
+    async def _requeue_loop(self) -> None:
+        while not self._stopping:
+            try:
+                requeued = await requeue_stale_submissions()
+                if requeued:
+                    print(f"Requeued {requeued} stale submissions")
+                    notify()
+            except Exception as e:
+                print(f"Failed to requeue stale submissions: {e}")
+            await asyncio.sleep(settings.JUDGE_REQUEUE_INTERVAL)
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.JUDGE_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+judge_pool = JudgeWorkerPool(settings.JUDGE_WORKERS)
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, column, func, update, values
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.database import AsyncSessionLocal
+from app.models.user import User
+
+# --------------------------
+# Write-behind last_login / last_seen
+# --------------------------
+# Logins and websocket activity only record a timestamp in memory. Every
+# LAST_SEEN_FLUSH_INTERVAL seconds the newest timestamp per (column, user)
+# is written with one statement per column:
+#   UPDATE users SET last_seen = GREATEST(COALESCE(users.last_seen, v.ts), v.ts)
+#   FROM (VALUES (:user_id, :ts), ...) AS v (user_id, ts)
+#   WHERE users.user_id = v.user_id
+# GREATEST keeps an older flush from another worker from moving it back.
+# A crash loses at most one interval of timestamps.
+
+TRACKED_COLUMNS = {
+    "last_login": User.last_login,
+    "last_seen": User.last_seen,
+}
+
+
+class LastSeenWriter:
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record_seen(self, user_id: int) -> None:
+        self._record("last_seen", user_id)
+
+    def record_login(self, user_id: int) -> None:
+        self._record("last_login", user_id)
+        self._record("last_seen", user_id)
+
+    def _record(self, column_name: str, user_id: int) -> None:
+        self._pending[(column_name, user_id)] = datetime.now(timezone.utc)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.LAST_SEEN_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Writes everything buffered; returns the number of rows sent"""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        by_column: Dict[str, List[Tuple[int, datetime]]] = {}
+        for (column_name, user_id), seen_at in pending.items():
+            by_column.setdefault(column_name, []).append((user_id, seen_at))
+
+        try:
+            async with AsyncSessionLocal() as db:
+                for column_name, rows in by_column.items():
+                    for start in range(0, len(rows), settings.LAST_SEEN_FLUSH_BATCH):
+                        await db.execute(
+                            _bulk_update(column_name, rows[start:start + settings.LAST_SEEN_FLUSH_BATCH])
+                        )
+                await db.commit()
+        except Exception as e:
+            # Put the timestamps back unless newer ones arrived meanwhile
+            for key, seen_at in pending.items():
+                if key not in self._pending:
+                    self._pending[key] = seen_at
+            print(f"Failed to flush last seen timestamps: {e}")
+            return 0
+
+        metrics.incr("last_seen.flushes")
+        metrics.incr("last_seen.rows", len(pending))
+        return len(pending)
+
+
+def _bulk_update(column_name: str, rows: List[Tuple[int, datetime]]):
+    target = TRACKED_COLUMNS[column_name]
+    seen = values(
+        column("user_id", Integer),
+        column("ts", DateTime(timezone=True)),
+        name="v",
+    ).data(rows)
+    return (
+        update(User)
+        .where(User.user_id == seen.c.user_id)
+        .values({
+            column_name: func.greatest(func.coalesce(target, seen.c.ts), seen.c.ts),
+            # Activity isn't a profile change: keep updated_at's onupdate out
+            "updated_at": User.updated_at,
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+
+last_seen_writer = LastSeenWriter()
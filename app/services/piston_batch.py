@@ -0,0 +1,347 @@
+import re
+import secrets
+import signal
+from typing import Any, Dict, List, Optional, Tuple
+
+# --------------------------
+# Batched execution: compile once, run N inputs
+# --------------------------
+# Piston executes one stdin per request, so a compiled language pays for a
+# full compilation on every test case. For C/C++ we append a small harness
+# that runs from a high-priority constructor *before* the user's main():
+# it forks once per test case, feeds the child's stdin through a pipe and
+# lets the child fall through into the untouched main(). The parent waits
+# for each child and prints a marker line carrying how it ended, CPU time
+# and peak memory, so every case is still judged in a fresh process
+# exactly like an unbatched run. The per-case timeout is the parent's own
+# timer: only when it fired (and SIGKILLed the child) is the case a
+# timeout, never because of what the program itself exited or died with.
+#
+# The inputs are compiled into the harness as string literals: Piston's
+# gcc/g++ packages compile every uploaded file, so they can't be sent as
+# extra files, and a single stdin would need a delimiter user programs
+# could read past.
+
+BATCH_LANGUAGES = {"c", "c++"}
+
+SOURCE_FILE_NAMES = {
+    "c": "main.c",
+    "c++": "main.cpp",
+}
+
+# Characters that can go into a C string literal unescaped; everything
+# else (including '?', to rule out trigraphs) becomes a 3-digit octal escape
+_LITERAL_SAFE = frozenset(
+    b" !#$%&'()*+,-./0123456789:;<=>@ABCDEFGHIJKLMNOPQRSTUVWXYZ[]^_`"
+    b"abcdefghijklmnopqrstuvwxyz{|}~"
+)
+LITERAL_CHUNK = 76  # bytes per source line
+
+# How a case ended, as reported in its stdout marker line
+EXITED = "E"    # value is the exit status
+SIGNALED = "S"  # value is the signal number
+TIMED_OUT = "T"  # the harness timer fired; value is the signal (SIGKILL)
+
+# Size of "@@codered-<16 hex>@@" and the rest of its marker lines, counted
+# against Piston's per-stream output cap when sizing batches
+MARKER_LENGTH = len("@@codered-@@") + 16
+STDOUT_MARKER_OVERHEAD = MARKER_LENGTH + len("\n:9999:E:255:99999:9999999\n")
+STDERR_MARKER_OVERHEAD = MARKER_LENGTH + len("\n:9999\n")
+
+# fork/wait4/setitimer/pipe are hidden by glibc under gcc's strict -std=c11;
+# g++ always defines _GNU_SOURCE. #line keeps compiler messages aligned
+# with the user's own line numbers.
+HARNESS_PRELUDE = "#ifndef _GNU_SOURCE\n#define _GNU_SOURCE 1\n#endif\n#line 1\n"
+
+HARNESS_TEMPLATE = r"""
+/* ---- CodeRed batch harness ---- */
+#include <errno.h>
+#include <signal.h>
+#include <stdio.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/time.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+
+%(inputs)s
+
+static const char *const codered_inputs[] = { %(input_names)s };
+static const size_t codered_input_sizes[] = { %(input_sizes)s };
+
+static volatile pid_t codered_child;
+static volatile sig_atomic_t codered_timer_fired;
+
+static void codered_on_timer(int codered_signal)
+{
+    (void)codered_signal;
+    codered_timer_fired = 1;
+    if (codered_child > 0) {
+        kill(codered_child, SIGKILL);
+    }
+}
+
+__attribute__((constructor(101)))
+static void codered_batch_harness(void)
+{
+    int codered_i;
+    struct sigaction codered_action;
+    struct itimerval codered_timer;
+
+    /* a child that exits without reading all its input must not kill us */
+    signal(SIGPIPE, SIG_IGN);
+    /* no SA_RESTART: the timer has to interrupt a blocked write/wait4 */
+    memset(&codered_action, 0, sizeof codered_action);
+    codered_action.sa_handler = codered_on_timer;
+    sigemptyset(&codered_action.sa_mask);
+    sigaction(SIGALRM, &codered_action, NULL);
+
+    for (codered_i = 1; codered_i <= %(count)d; codered_i++) {
+        pid_t codered_pid;
+        int codered_pipe[2];
+        int codered_status = 0;
+        char codered_kind;
+        int codered_value;
+        const char *codered_data = codered_inputs[codered_i - 1];
+        size_t codered_left = codered_input_sizes[codered_i - 1];
+        struct rusage codered_usage;
+
+        fflush(stdout);
+        fflush(stderr);
+        if (pipe(codered_pipe) != 0) {
+            _exit(111);
+        }
+        codered_child = 0;
+        codered_timer_fired = 0;
+        codered_pid = fork();
+        if (codered_pid < 0) {
+            _exit(111);
+        }
+        if (codered_pid == 0) {
+            /* the program starts with default dispositions (timers aren't
+               inherited across fork) */
+            signal(SIGPIPE, SIG_DFL);
+            signal(SIGALRM, SIG_DFL);
+            close(codered_pipe[1]);
+            if (dup2(codered_pipe[0], STDIN_FILENO) < 0) {
+                _exit(111);
+            }
+            close(codered_pipe[0]);
+            return;
+        }
+
+        codered_child = codered_pid;
+        memset(&codered_timer, 0, sizeof codered_timer);
+        codered_timer.it_value.tv_sec = %(timeout_ms)d / 1000;
+        codered_timer.it_value.tv_usec = (%(timeout_ms)d %% 1000) * 1000;
+        setitimer(ITIMER_REAL, &codered_timer, NULL);
+
+        /* the timer bounds this loop: once the child dies, writes fail */
+        close(codered_pipe[0]);
+        while (codered_left > 0) {
+            ssize_t codered_written = write(codered_pipe[1], codered_data, codered_left);
+            if (codered_written < 0) {
+                if (errno == EINTR) {
+                    continue;
+                }
+                break;
+            }
+            codered_data += codered_written;
+            codered_left -= (size_t)codered_written;
+        }
+        close(codered_pipe[1]);
+
+        memset(&codered_usage, 0, sizeof codered_usage);
+        while (wait4(codered_pid, &codered_status, 0, &codered_usage) < 0 && errno == EINTR) {
+        }
+        codered_child = 0;
+        memset(&codered_timer, 0, sizeof codered_timer);
+        setitimer(ITIMER_REAL, &codered_timer, NULL);
+
+        if (WIFEXITED(codered_status)) {
+            codered_kind = '%(exited)s';
+            codered_value = WEXITSTATUS(codered_status);
+        } else {
+            /* a timer that fires as the child exits on its own changes nothing */
+            codered_kind = codered_timer_fired && WTERMSIG(codered_status) == SIGKILL
+                ? '%(timed_out)s' : '%(signaled)s';
+            codered_value = WTERMSIG(codered_status);
+        }
+
+        printf("\n%(marker)s:%%d:%%c:%%d:%%ld:%%ld\n",
+               codered_i,
+               codered_kind,
+               codered_value,
+               (long)(codered_usage.ru_utime.tv_sec + codered_usage.ru_stime.tv_sec) * 1000L
+                   + (long)(codered_usage.ru_utime.tv_usec + codered_usage.ru_stime.tv_usec) / 1000L,
+               (long)codered_usage.ru_maxrss);
+        fflush(stdout);
+        fprintf(stderr, "\n%(marker)s:%%d\n", codered_i);
+        fflush(stderr);
+    }
+    _exit(0);
+}
+"""
+
+
+def supports_batching(language: str) -> bool:
+    return language in BATCH_LANGUAGES
+
+
+def plan_batches(
+    test_cases: List[Dict[str, Any]], max_cases: int, output_limit: int
+) -> List[Tuple[int, int]]:
+    """
+    Splits the cases into (start, end) slices of at most `max_cases` whose
+    expected output plus marker lines fit in `output_limit` characters per
+    stream (Piston's output_max_size; 0 = no cap). A case too large to
+    share a batch gets a slice of its own.
+    """
+    max_cases = max(1, max_cases)
+    slices: List[Tuple[int, int]] = []
+    start = 0
+    stdout_used = stderr_used = 0
+    for pos, case in enumerate(test_cases):
+        stdout_cost = len(case.get("output", "") or "") + 1 + STDOUT_MARKER_OVERHEAD
+        stderr_cost = STDERR_MARKER_OVERHEAD
+        full = pos - start >= max_cases or (
+            output_limit > 0 and pos > start and (
+                stdout_used + stdout_cost > output_limit
+                or stderr_used + stderr_cost > output_limit
+            )
+        )
+        if full:
+            slices.append((start, pos))
+            start, stdout_used, stderr_used = pos, 0, 0
+        stdout_used += stdout_cost
+        stderr_used += stderr_cost
+    if start < len(test_cases):
+        slices.append((start, len(test_cases)))
+    return slices
+
+
+def c_string_literal(data: bytes) -> str:
+    """
+    `data` as a C string literal, split over several lines (adjacent
+    literals concatenate). The length is passed separately, so embedded
+    NUL bytes survive.
+    """
+    if not data:
+        return '    ""'
+    lines = []
+    for start in range(0, len(data), LITERAL_CHUNK):
+        chunk = data[start:start + LITERAL_CHUNK]
+        lines.append('    "' + "".join(
+            chr(byte) if byte in _LITERAL_SAFE else f"\\{byte:03o}"
+            for byte in chunk
+        ) + '"')
+    return "\n".join(lines)
+
+
+def build_batch_payload(
+    language: str,
+    code: str,
+    test_cases: List[Dict[str, Any]],
+    case_timeout_ms: int,
+    run_timeout_ms: int,
+    compile_timeout_ms: int,
+    memory_limit_bytes: int,
+) -> tuple[Dict[str, Any], str]:
+    """
+    Builds a single Piston payload that compiles `code` once and runs it
+    against every test case. Returns (payload, marker).
+    """
+    marker = f"@@codered-{secrets.token_hex(8)}@@"
+
+    inputs = [(case.get("input", "") or "").encode("utf-8") for case in test_cases]
+    harness = HARNESS_TEMPLATE % {
+        "count": len(test_cases),
+        "timeout_ms": case_timeout_ms,
+        "marker": marker,
+        "exited": EXITED,
+        "signaled": SIGNALED,
+        "timed_out": TIMED_OUT,
+        "inputs": "\n".join(
+            f"static const char codered_input_{i}[] =\n{c_string_literal(data)};"
+            for i, data in enumerate(inputs, start=1)
+        ),
+        "input_names": ", ".join(
+            f"codered_input_{i}" for i in range(1, len(inputs) + 1)
+        ),
+        "input_sizes": ", ".join(str(len(data)) for data in inputs),
+    }
+
+    payload = {
+        "language": language,
+        "version": "*",
+        # Only the source: Piston compiles every file it is given
+        "files": [
+            {
+                "name": SOURCE_FILE_NAMES[language],
+                "content": HARNESS_PRELUDE + code + "\n" + harness,
+            }
+        ],
+        "stdin": "",
+        "run_timeout": run_timeout_ms,
+        "compile_timeout": compile_timeout_ms,
+        # Piston applies the limit per process, so each forked case gets it
+        "run_memory_limit": memory_limit_bytes,
+    }
+    return payload, marker
+
+
+def _signal_name(number: int) -> str:
+    try:
+        return signal.Signals(number).name
+    except ValueError:
+        return f"SIG{number}"
+
+
+def parse_batch_output(
+    run_stage: Dict[str, Any], marker: str, count: int
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Splits the combined stdout/stderr of a batched run back into per-case
+    pieces. Cases whose marker never appeared (runner killed the batch,
+    output was truncated, ...) come back as None so the caller can re-run
+    them one by one. Each case's code/signal/status mirror what Piston
+    reports for an unbatched run: a signal name and no exit code for a
+    killed program, status "TO" plus SIGKILL only when the harness timer
+    fired.
+    """
+    stdout: str = run_stage.get("stdout") or ""
+    stderr: str = run_stage.get("stderr") or ""
+
+    out_pattern = re.compile(
+        r"\n" + re.escape(marker)
+        + r":(\d+):([" + EXITED + SIGNALED + TIMED_OUT + r"]):(\d+):(\d+):(\d+)\n"
+    )
+    err_pattern = re.compile(r"\n" + re.escape(marker) + r":(\d+)\n")
+
+    parsed: List[Optional[Dict[str, Any]]] = [None] * count
+
+    position = 0
+    for match in out_pattern.finditer(stdout):
+        index = int(match.group(1))
+        if 1 <= index <= count:
+            kind, value = match.group(2), int(match.group(3))
+            parsed[index - 1] = {
+                "code": value if kind == EXITED else None,
+                "signal": None if kind == EXITED else _signal_name(value),
+                "status": "TO" if kind == TIMED_OUT else None,
+                "stdout": stdout[position:match.start()],
+                "stderr": "",
+                "cpu_time": int(match.group(4)),
+                # ru_maxrss is in KiB, Piston reports bytes
+                "memory": int(match.group(5)) * 1024,
+            }
+        position = match.end()
+
+    position = 0
+    for match in err_pattern.finditer(stderr):
+        index = int(match.group(1))
+        if 1 <= index <= count and parsed[index - 1] is not None:
+            parsed[index - 1]["stderr"] = stderr[position:match.start()]
+        position = match.end()
+
+    return parsed
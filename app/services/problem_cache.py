@@ -0,0 +1,156 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+from cachetools import TTLCache
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.core.redis import redis_client
+from app.models.problems import Problems
+from app.models.test_cases import TestCases
+from app.schemas.problem import ProblemResponse
+from app.services import problem_service
+
+# --------------------------
+# Problem response cache
+# --------------------------
+# GET /problems/{id} serves pre-serialized ProblemResponse JSON:
+#   1. process-local TTLCache
+#   2. Redis
+#   3. problem row + sample cases (problem_service.get_problem_by_id)
+# Both tiers are keyed by a version, problems.updated_at plus
+# test_cases.updated_at (the samples), read with one small query on every
+# lookup like app.services.test_case_cache, so an edit made outside the
+# ORM is served on the next request. The ETag is a hash of the body.
+
+PROBLEM_KEY = "problem:v2:{problem_id}:{version}"
+
+
+@dataclass(frozen=True)
+class CachedProblem:
+    body: bytes
+    etag: str
+    version: str
+
+
+def _make_entry(body: bytes, version: str) -> CachedProblem:
+    return CachedProblem(
+        body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', version=version
+    )
+
+
+_local_cache: TTLCache = TTLCache(
+    maxsize=settings.PROBLEM_CACHE_MAX_ENTRIES,
+    ttl=settings.PROBLEM_CACHE_LOCAL_TTL,
+)
+
+
+async def _current_version(db: Session, problem_id: int) -> Optional[str]:
+    """The version the database holds now, or None if the problem doesn't exist"""
+    query = (
+        select(Problems.updated_at, TestCases.updated_at.label("test_cases_updated_at"))
+        .outerjoin(TestCases, TestCases.problem_id == Problems.problem_id)
+        .where(Problems.problem_id == problem_id)
+        .order_by(TestCases.test_cases_id)
+        .limit(1)
+    )
+    row = (await db.execute(query)).first()
+    if not row:
+        return None
+    return ":".join(
+        str(ts.timestamp()) if ts else "0"
+        for ts in (row.updated_at, row.test_cases_updated_at)
+    )
+
+
+async def get_problem_response(db: Session, problem_id: int) -> Optional[CachedProblem]:
+    """
+    The serialized ProblemResponse for a problem, or None if it doesn't
+    exist. Costs one small version query; the problem itself only comes
+    from the database on a full miss.
+    """
+    version = await _current_version(db, problem_id)
+    if version is None:
+        _local_cache.pop(problem_id, None)
+        return None
+
+    entry = _local_cache.get(problem_id)
+    if entry is not None and entry.version == version:
+        metrics.incr("problem_cache.hit.local")
+        return entry
+
+    key = PROBLEM_KEY.format(problem_id=problem_id, version=version)
+    try:
+        blob = await redis_client.get(key)
+    except RedisError as e:
+        print(f"[cache] Redis unavailable for problems: {e}")
+        blob = None
+
+    if blob is not None:
+        metrics.incr("problem_cache.hit.redis")
+        entry = _make_entry(blob.encode("utf-8"), version)
+    else:
+        metrics.incr("problem_cache.miss")
+        problem = await problem_service.get_problem_by_id(db, problem_id)
+        if problem is None:
+            return None
+        body = ProblemResponse.model_validate(problem).model_dump_json()
+        entry = _make_entry(body.encode("utf-8"), version)
+        try:
+            await redis_client.set(key, body, ex=settings.PROBLEM_CACHE_REDIS_TTL)
+        except RedisError as e:
+            print(f"[cache] Failed to store problem in Redis: {e}")
+
+    _local_cache[problem_id] = entry
+    return entry
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 asks for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def invalidate_problem(problem_id: int) -> None:
+    """
+    Drops this process's cached response. Other processes and Redis need
+    nothing: their entries no longer match the version.
+    """
+    _local_cache.pop(problem_id, None)
+
+
+# Samples come from test_cases, so writes to either table count. Dropping
+# the local entry on commit only frees it early; the version check is what
+# keeps readers correct.
+_PENDING_KEY = "problem_cache_invalidate"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_problems(session: Session, flush_context) -> None:
+    changed = [
+        obj.problem_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, (TestCases, Problems))
+    ]
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_problems(session: Session) -> None:
+    for problem_id in session.info.pop(_PENDING_KEY, None) or ():
+        invalidate_problem(problem_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_problems(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,183 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.core.redis import redis_client
+from app.models.problems import Problems
+
+# --------------------------
+# Active problem index
+# --------------------------
+# Redis sets of active problem ids, one per difficulty and one per
+# (difficulty, topic), so a random pick is a single SRANDMEMBER instead of
+# ORDER BY random() over the whole table. ORM writes to problems update the
+# sets once the transaction commits; the whole index is rebuilt from the
+# table every PROBLEM_INDEX_TTL seconds to pick up anything written
+# outside the ORM.
+
+DIFFICULTY_KEY = "problems:active:{difficulty}"
+TOPIC_KEY = "problems:active:{difficulty}:topic:{topic_id}"
+# Present while the index is considered complete
+BUILT_KEY = "problems:active:built"
+# Every set key the last rebuild created, so the next one can drop them
+REGISTRY_KEY = "problems:active:keys"
+
+# Picks that hit an id which turned out to be gone before giving up
+MAX_PICK_ATTEMPTS = 3
+
+# One rebuild at a time per process when the index has expired
+_rebuild_lock = asyncio.Lock()
+
+
+def _keys_for(difficulty: Optional[str], topic_id: Optional[int]) -> List[str]:
+    if difficulty is None:
+        return []
+    keys = [DIFFICULTY_KEY.format(difficulty=difficulty)]
+    if topic_id is not None:
+        keys.append(TOPIC_KEY.format(difficulty=difficulty, topic_id=topic_id))
+    return keys
+
+
+async def rebuild(db: Session) -> int:
+    """Reloads the index from the problems table; returns the number of active problems"""
+    result = await db.execute(
+        select(Problems.problem_id, Problems.difficulty_level, Problems.topic_id)
+        .where(Problems.is_active == True)
+    )
+    rows = result.all()
+    members: Dict[str, List[int]] = {}
+    for problem_id, difficulty, topic_id in rows:
+        for key in _keys_for(difficulty, topic_id):
+            members.setdefault(key, []).append(problem_id)
+
+    old_keys = await redis_client.smembers(REGISTRY_KEY)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(REGISTRY_KEY, *old_keys)
+        for key, problem_ids in members.items():
+            pipe.sadd(key, *problem_ids)
+        if members:
+            pipe.sadd(REGISTRY_KEY, *members)
+        pipe.set(BUILT_KEY, "1", ex=settings.PROBLEM_INDEX_TTL)
+        await pipe.execute()
+
+    metrics.incr("problem_index.rebuilds")
+    return len(rows)
+
+
+async def pick_random_problem_id(
+    db: Session, difficulty: str, topic_id: Optional[int] = None
+) -> Optional[int]:
+    """
+    A random active problem id of that difficulty (and topic), or None if
+    there is none. `db` is only used when the index has to be (re)built.
+    """
+    if not await redis_client.exists(BUILT_KEY):
+        async with _rebuild_lock:
+            if not await redis_client.exists(BUILT_KEY):
+                await rebuild(db)
+
+    key = _keys_for(difficulty, topic_id)[-1]
+    problem_id = await redis_client.srandmember(key)
+    metrics.incr("problem_index.picks")
+    return int(problem_id) if problem_id is not None else None
+
+
+async def discard(problem_id: int) -> None:
+    """
+    Drops an id a pick returned but that is no longer active (written
+    outside the ORM) from every indexed set, like apply_changes does.
+    """
+    all_keys = await redis_client.smembers(REGISTRY_KEY)
+    if all_keys:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in all_keys:
+                pipe.srem(key, problem_id)
+            await pipe.execute()
+    metrics.incr("problem_index.stale")
+
+
+async def apply_changes(changes: Iterable[Tuple[int, Optional[Tuple[str, int]]]]) -> None:
+    """
+    changes: (problem_id, (difficulty, topic_id) it belongs under now, or
+    None if it is inactive/deleted). The old values aren't needed: an id is
+    removed from every indexed set first (there are only a few dozen).
+    """
+    try:
+        all_keys = await redis_client.smembers(REGISTRY_KEY)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for problem_id, current in changes:
+                for key in all_keys:
+                    pipe.srem(key, problem_id)
+                if current is not None:
+                    keys = _keys_for(*current)
+                    for key in keys:
+                        pipe.sadd(key, problem_id)
+                    pipe.sadd(REGISTRY_KEY, *keys)
+            await pipe.execute()
+    except RedisError as e:
+        # The sets stay stale until the next rebuild; force it now
+        print(f"[index] Failed to update the problem index: {e}")
+        await invalidate()
+
+
+async def invalidate() -> None:
+    """Makes the next pick rebuild the whole index"""
+    try:
+        await redis_client.delete(BUILT_KEY)
+    except RedisError as e:
+        print(f"[index] Failed to invalidate the problem index: {e}")
+
+
+# Same commit-time pattern as app.services.test_case_cache
+_PENDING_KEY = "problem_index_changes"
+
+
+# Sentinel for a row whose indexed columns aren't loaded (expired): reading
+# them here would mean IO inside a flush, so the index is rebuilt instead
+_UNKNOWN = "unknown"
+
+
+def _indexed_position(session: Session, obj: Problems):
+    if obj in session.deleted:
+        return None
+    loaded = inspect(obj).dict
+    if not all(name in loaded for name in ("is_active", "difficulty_level", "topic_id")):
+        return _UNKNOWN
+    return (obj.difficulty_level, obj.topic_id) if obj.is_active else None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_problems(session: Session, flush_context) -> None:
+    changed = {
+        obj.problem_id: _indexed_position(session, obj)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, Problems) and obj.problem_id is not None
+    }
+    if changed:
+        session.info.setdefault(_PENDING_KEY, {}).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changed_problems(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if _UNKNOWN in pending.values():
+        loop.create_task(invalidate())
+    else:
+        loop.create_task(apply_changes(list(pending.items())))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_problems(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
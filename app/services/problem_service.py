@@ -1,67 +1,84 @@
+import json
+from typing import Optional
+
+from redis.exceptions import RedisError
 from sqlalchemy.orm import Session
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 from app.models.problems import Problems
+from app.services import problem_index, test_case_cache
 from sqlalchemy.sql.expression import func
 
+
+async def _attach_sample_cases(db: Session, problem: Problems) -> Problems:
+    # samples come pre-split from the test case cache, no JSONB load here
+    cached = await test_case_cache.get_test_cases(db, problem.problem_id)
+
+    problem.sample_test_cases = [
+        {"input": case.get("input"), "output": case.get("output")}
+        for case in (cached.samples if cached else ())
+    ]
+    return problem
+
+
 async def get_problem_by_id(db:Session, problem_id: int):
-    # using selectinload fetching problem and all its test_cases in one query
-    query = (
-        select(Problems)
-        .where(Problems.problem_id == problem_id)
-        .options(selectinload(Problems.test_cases))
-    )
+    query = select(Problems).where(Problems.problem_id == problem_id)
 
     result = await db.execute(query)
     problem = result.scalar_one_or_none()
 
     if not problem:
         return None
-    
-    test_cases_row = problem.test_cases[0] if problem.test_cases else None
 
-    sample_cases = []
+    return await _attach_sample_cases(db, problem)
 
-    if test_cases_row and test_cases_row.test_cases:
-        for case in test_cases_row.test_cases:
-            if case.get("hidden") is False:
-                sample_cases.append({
-                    "input": case.get("input"),
-                    "output": case.get("output")
-                })
+async def get_random_problem_by_difficulty(
+    db: Session, difficulty: str, topic_id: Optional[int] = None
+):
+    """
+    Picks from the active problem index (app.services.problem_index) and
+    serves the pick from the problem response cache, so a warm pick costs
+    only its version query. Falls back to ORDER BY random() when Redis is
+    unavailable. Returns a problem_cache.CachedProblem or None.
+    """
+    # problem_cache builds its entries with get_problem_by_id
+    from app.services import problem_cache
 
-    problem.sample_test_cases = sample_cases
-    return problem
+    try:
+        for _ in range(problem_index.MAX_PICK_ATTEMPTS):
+            problem_id = await problem_index.pick_random_problem_id(db, difficulty, topic_id)
+            if problem_id is None:
+                return None
+
+            entry = await problem_cache.get_problem_response(db, problem_id)
+            if entry is not None:
+                problem = json.loads(entry.body)
+                if problem["is_active"] and (
+                    problem["difficulty_level"] == difficulty
+                    and (topic_id is None or problem["topic_id"] == topic_id)
+                ):
+                    return entry
+            await problem_index.discard(problem_id)
+    except RedisError as e:
+        print(f"[index] Redis unavailable for random problem: {e}")
+
+    problem_id = await _random_problem_id_from_db(db, difficulty, topic_id)
+    if problem_id is None:
+        return None
+    return await problem_cache.get_problem_response(db, problem_id)
 
-async def get_random_problem_by_difficulty(db: Session,difficulty:str):
 
+async def _random_problem_id_from_db(
+    db: Session, difficulty: str, topic_id: Optional[int]
+) -> Optional[int]:
     query = (
-        select(Problems)
+        select(Problems.problem_id)
         .where(Problems.difficulty_level == difficulty)
         .where(Problems.is_active == True)
         .order_by(func.random())
         .limit(1)
-        .options(selectinload(Problems.test_cases))
     )
+    if topic_id is not None:
+        query = query.where(Problems.topic_id == topic_id)
 
-    # Execute the query
     result = await db.execute(query)
-    problem = result.scalar_one_or_none()
-
-    if not problem:
-        return None
-    
-    test_cases_row = problem.test_cases[0] if problem.test_cases else None
-    sample_cases = []
-
-    if test_cases_row and test_cases_row.test_cases:
-        for case in test_cases_row.test_cases:
-            if case.get("hidden") is False:
-                sample_cases.append({
-                    "input": case.get("input"),
-                    "output": case.get("output")
-                })
-    
-    problem.sample_test_cases = sample_cases
-    
-    return problem
\ No newline at end of file
+    return result.scalar_one_or_none()
@@ -0,0 +1,108 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.core.redis import redis_client
+
+# --------------------------
+# Verdict / result memoization
+# --------------------------
+# Content-addressed cache of execution results keyed by
+#   hash(scope, problem_id, test case version, language, normalized source)
+# so byte-identical Runs and re-Submits skip Piston entirely. Only verdicts
+# that are a property of the code are stored: never System Error (runner
+# failure), Time/Memory Limit Exceeded, or anything that came within
+# RESULT_CACHE_LIMIT_MARGIN of a limit, since those depend on runner load.
+
+RESULT_KEY = "result:{digest}"
+
+RUN_SCOPE = "run"
+SUBMIT_SCOPE = "submit"
+SUBMIT_FAIL_FAST_SCOPE = "submit-ff"
+
+_local_cache: TTLCache = TTLCache(
+    maxsize=settings.RESULT_CACHE_MAX_ENTRIES,
+    ttl=settings.RESULT_CACHE_TTL,
+)
+
+
+def normalize_source(code: str) -> str:
+    # Only changes that can never alter behaviour: line endings and
+    # trailing whitespace at the very end of the file.
+    return code.replace("\r\n", "\n").replace("\r", "\n").rstrip()
+
+
+def result_key(
+    scope: str, problem_id: int, version: str, language: str, code: str
+) -> str:
+    digest = hashlib.sha256()
+    for part in (scope, str(problem_id), version, language, normalize_source(code)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+async def get_result(key: str) -> Optional[Dict[str, Any]]:
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+
+    value = _local_cache.get(key)
+    if value is not None:
+        metrics.incr("result_cache.hit.local")
+        return value
+
+    try:
+        blob = await redis_client.get(RESULT_KEY.format(digest=key))
+    except RedisError as e:
+        print(f"[cache] Redis unavailable for results: {e}")
+        blob = None
+
+    if blob is None:
+        metrics.incr("result_cache.miss")
+        return None
+
+    value = json.loads(blob)
+    _local_cache[key] = value
+    metrics.incr("result_cache.hit.redis")
+    return value
+
+
+async def store_result(key: str, value: Dict[str, Any]) -> None:
+    if not settings.RESULT_CACHE_ENABLED:
+        return
+
+    _local_cache[key] = value
+    metrics.incr("result_cache.store")
+    try:
+        await redis_client.set(
+            RESULT_KEY.format(digest=key),
+            json.dumps(value),
+            ex=settings.RESULT_CACHE_TTL,
+        )
+    except RedisError as e:
+        print(f"[cache] Failed to store result in Redis: {e}")
+
+
+UNCACHEABLE_STATUSES = frozenset(
+    {"System Error", "Time Limit Exceeded", "Memory Limit Exceeded"}
+)
+
+
+def is_cacheable(results, limits) -> bool:
+    """`limits` is the ExecutionLimits the results were produced under"""
+    margin = settings.RESULT_CACHE_LIMIT_MARGIN
+    time_budget = limits.run_timeout_ms / 1000.0 * margin  # results carry seconds
+    memory_budget = limits.memory_limit_bytes * margin
+    for res in results:
+        if res["status"] in UNCACHEABLE_STATUSES:
+            return False
+        if (res.get("time") or 0) >= time_budget:
+            return False
+        if limits.memory_limit_bytes > 0 and (res.get("memory") or 0) >= memory_budget:
+            return False
+    return True
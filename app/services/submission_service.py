@@ -1,20 +1,24 @@
 import asyncio
-import json
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-import httpx
+from sqlalchemy import func, update
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
 # -- App imports --
+from app.config import settings
+from app.core.piston import PistonClient, piston_client
+from app.core.ws_manager import manager
+from app.database import AsyncSessionLocal, unit_of_work
 from app.models.submission import Submission
-from app.models.test_cases import TestCases
 from app.schemas.submission import CodeRunRequest, SolutionSubmitRequest
+from app.services import judge_queue, piston_batch, result_cache, test_case_cache
 
 # --------------------------
 # Piston Configuration
 # --------------------------
-PISTON_API_URL = "http://20.247.28.65:2000/api/v2/execute"
+# The HTTP client, URL and concurrency cap live in app.core.piston
 
 # If your frontend still uses Judge0 language IDs,
 # map them to Piston language names here.
@@ -36,15 +40,183 @@ def get_piston_language(lang_id: int) -> str:
     return LANGUAGE_MAP.get(lang_id, "python")
 
 
+# Piston run timeout is in milliseconds
+RUN_TIMEOUT_MS = 3000  # 3 seconds per test case (when no problem limits apply)
+
+# (time, memory) multipliers applied to Problems.time_limit / memory_limit,
+# relative to C/C++
+LANGUAGE_LIMIT_MULTIPLIERS: Dict[str, tuple[float, float]] = {
+    "c": (1.0, 1.0),
+    "c++": (1.0, 1.0),
+    "java": (2.0, 2.0),
+    "python": (3.0, 1.5),
+    "javascript": (2.0, 1.5),
+}
+
+# stderr signatures of a program dying because it ran out of memory
+OUT_OF_MEMORY_SIGNATURES = (
+    "MemoryError",
+    "std::bad_alloc",
+    "java.lang.OutOfMemoryError",
+    "JavaScript heap out of memory",
+)
+
+
+@dataclass(frozen=True)
+class ExecutionLimits:
+    """Per-job limits sent to Piston (timeouts in ms, memory in bytes)"""
+    run_timeout_ms: int = RUN_TIMEOUT_MS
+    compile_timeout_ms: int = settings.PISTON_COMPILE_TIMEOUT
+    memory_limit_bytes: int = -1  # -1 = no limit
+
+
+DEFAULT_LIMITS = ExecutionLimits()
+
+
+def get_execution_limits(
+    cached: test_case_cache.ProblemTestCases, language: str
+) -> ExecutionLimits:
+    """Problem limits scaled for the language and capped to what the runner accepts"""
+    time_factor, memory_factor = LANGUAGE_LIMIT_MULTIPLIERS.get(language, (1.0, 1.0))
+
+    run_timeout_ms = RUN_TIMEOUT_MS
+    if cached.time_limit and cached.time_limit > 0:
+        run_timeout_ms = int(cached.time_limit * time_factor)
+    run_timeout_ms = max(1, min(run_timeout_ms, settings.PISTON_MAX_RUN_TIMEOUT))
+
+    memory_limit_bytes = -1
+    if cached.memory_limit and cached.memory_limit > 0:
+        memory_limit_bytes = int(cached.memory_limit * memory_factor * 1024 * 1024)
+
+    return ExecutionLimits(
+        run_timeout_ms=run_timeout_ms,
+        compile_timeout_ms=settings.PISTON_COMPILE_TIMEOUT,
+        memory_limit_bytes=memory_limit_bytes,
+    )
+
+
+# --------------------------
+# Helpers: Normalized per-test-case results
+# --------------------------
+def _case_fields(test_case: Dict[str, Any]) -> tuple[str, str, bool]:
+    stdin_input: str = test_case.get("input", "") or ""
+    expected_output: str = (test_case.get("output") or "").strip()
+    is_hidden: bool = bool(test_case.get("hidden", False))
+    return stdin_input, expected_output, is_hidden
+
+
+def _compile_error_result(
+    test_case: Dict[str, Any], index: int, compile_stage: Dict[str, Any]
+) -> Dict[str, Any]:
+    stdin_input, expected_output, is_hidden = _case_fields(test_case)
+    return {
+        "index": index,
+        "status": "Compilation Error",
+        "passed": False,
+        "input": stdin_input,
+        "expected": expected_output,
+        "actual": "",
+        "stderr": compile_stage.get("stderr") or compile_stage.get("output", ""),
+        "time": float(compile_stage.get("cpu_time") or 0) / 1000.0,
+        "memory": int(compile_stage.get("memory") or 0),
+        "hidden": is_hidden,
+    }
+
+
+def _timed_out(run_stage: Dict[str, Any], limits: ExecutionLimits) -> bool:
+    # Piston marks timeouts with status "TO" (the batch harness does too);
+    # older runners only report a SIGKILL, so compare the times as well.
+    if run_stage.get("status") == "TO":
+        return True
+    elapsed = float(run_stage.get("wall_time") or run_stage.get("cpu_time") or 0)
+    if run_stage.get("signal") == "SIGKILL" and elapsed >= limits.run_timeout_ms:
+        return True
+    return float(run_stage.get("cpu_time") or 0) > limits.run_timeout_ms
+
+
+def _memory_exceeded(
+    run_stage: Dict[str, Any], limits: ExecutionLimits, exit_code: Optional[int]
+) -> bool:
+    memory_used = int(run_stage.get("memory") or 0)
+    if limits.memory_limit_bytes > 0 and memory_used >= limits.memory_limit_bytes:
+        return True
+    stderr: str = run_stage.get("stderr") or ""
+    return exit_code != 0 and any(sig in stderr for sig in OUT_OF_MEMORY_SIGNATURES)
+
+
+def _run_result(
+    test_case: Dict[str, Any],
+    index: int,
+    run_stage: Dict[str, Any],
+    limits: ExecutionLimits = DEFAULT_LIMITS,
+) -> Dict[str, Any]:
+    stdin_input, expected_output, is_hidden = _case_fields(test_case)
+
+    actual_output: str = (run_stage.get("stdout") or "").strip()
+    stderr: str = run_stage.get("stderr") or ""
+    exit_code: int = run_stage.get("code", 0)
+
+    time_used = float(run_stage.get("cpu_time") or 0) / 1000.0  # ms → s
+    memory_used = int(run_stage.get("memory") or 0)
+
+    status = "Accepted"
+    passed = True
+
+    if _timed_out(run_stage, limits):
+        status = "Time Limit Exceeded"
+        passed = False
+    elif _memory_exceeded(run_stage, limits, exit_code):
+        status = "Memory Limit Exceeded"
+        passed = False
+    elif exit_code != 0:
+        status = "Runtime Error"
+        passed = False
+    elif actual_output != expected_output:
+        status = "Wrong Answer"
+        passed = False
+
+    return {
+        "index": index,
+        "status": status,
+        "passed": passed,
+        "input": stdin_input,
+        "expected": expected_output,
+        "actual": actual_output,
+        "stderr": stderr,
+        "time": time_used,
+        "memory": memory_used,
+        "hidden": is_hidden,
+    }
+
+
+def _system_error_result(
+    test_case: Dict[str, Any], index: int, error: Exception
+) -> Dict[str, Any]:
+    stdin_input, expected_output, is_hidden = _case_fields(test_case)
+    return {
+        "index": index,
+        "status": "System Error",
+        "passed": False,
+        "input": stdin_input,
+        "expected": expected_output,
+        "actual": "",
+        "stderr": str(error),
+        "time": 0.0,
+        "memory": 0,
+        "hidden": is_hidden,
+    }
+
+
 # --------------------------
 # Helper: Execute Single Test Case on Piston
 # --------------------------
 async def run_piston_job(
-    client: httpx.AsyncClient,
+    client: PistonClient,
     language: str,
     code: str,
     test_case: Dict[str, Any],
     index: int,
+    limits: ExecutionLimits = DEFAULT_LIMITS,
 ) -> Dict[str, Any]:
     """
     Runs a single test case against Piston and returns a normalized result dict.
@@ -52,141 +224,347 @@ async def run_piston_job(
     Returned dict fields:
         index, status, passed, input, expected, actual, stderr, time, memory, hidden
     """
-    stdin_input: str = test_case.get("input", "") or ""
-    expected_output: str = (test_case.get("output") or "").strip()
-    is_hidden: bool = bool(test_case.get("hidden", False))
-
     payload = {
         "language": language,
         "version": "*",  # latest version
         "files": [{"content": code}],
-        "stdin": stdin_input,
-        # Piston run timeout is in milliseconds
-        "run_timeout": 3000,  # 3 seconds
+        "stdin": test_case.get("input", "") or "",
+        "run_timeout": limits.run_timeout_ms,
+        "compile_timeout": limits.compile_timeout_ms,
+        "run_memory_limit": limits.memory_limit_bytes,
     }
 
     try:
-        response = await client.post(PISTON_API_URL, json=payload)
-        response.raise_for_status()
-        data = response.json()
+        data = await client.execute(payload)
 
         run_stage: Dict[str, Any] = data.get("run", {}) or {}
         compile_stage: Dict[str, Any] = data.get("compile", {}) or {}
 
-        # --------------------------
         # 1. Compilation Error
-        # --------------------------
         if compile_stage and compile_stage.get("code", 0) != 0:
-            return {
-                "index": index,
-                "status": "Compilation Error",
-                "passed": False,
-                "input": stdin_input,
-                "expected": expected_output,
-                "actual": "",
-                "stderr": compile_stage.get("stderr") or compile_stage.get("output", ""),
-                "time": float(compile_stage.get("cpu_time") or 0) / 1000.0,
-                "memory": int(compile_stage.get("memory") or 0),
-                "hidden": is_hidden,
-            }
+            return _compile_error_result(test_case, index, compile_stage)
 
-        # --------------------------
-        # 2. Runtime / Logic
-        # --------------------------
-        actual_output: str = (run_stage.get("stdout") or "").strip()
-        stderr: str = run_stage.get("stderr") or ""
-        exit_code: int = run_stage.get("code", 0)
-
-        time_used = float(run_stage.get("cpu_time") or 0) / 1000.0  # ms → s
-        memory_used = int(run_stage.get("memory") or 0)
-
-        status = "Accepted"
-        passed = True
-
-        if exit_code != 0:
-            status = "Runtime Error"
-            passed = False
-        elif actual_output != expected_output:
-            status = "Wrong Answer"
-            passed = False
-
-        return {
-            "index": index,
-            "status": status,
-            "passed": passed,
-            "input": stdin_input,
-            "expected": expected_output,
-            "actual": actual_output,
-            "stderr": stderr,
-            "time": time_used,
-            "memory": memory_used,
-            "hidden": is_hidden,
-        }
+        # 2. Runtime / Logic / Limits
+        return _run_result(test_case, index, run_stage, limits)
 
     except Exception as e:
         # System-level error (Piston unreachable, timeout, etc.)
-        return {
-            "index": index,
-            "status": "System Error",
-            "passed": False,
-            "input": stdin_input,
-            "expected": expected_output,
-            "actual": "",
-            "stderr": str(e),
-            "time": 0.0,
-            "memory": 0,
-            "hidden": is_hidden,
-        }
+        return _system_error_result(test_case, index, e)
+
+
+# --------------------------
+# Helper: Execute Many Test Cases With One Compilation
+# --------------------------
+async def run_piston_batch(
+    client: PistonClient,
+    language: str,
+    code: str,
+    test_cases: List[Dict[str, Any]],
+    start_index: int,
+    limits: ExecutionLimits = DEFAULT_LIMITS,
+) -> List[Dict[str, Any]]:
+    """
+    Compiles `code` once and runs it against every case in `test_cases`
+    (see app.services.piston_batch). Returns the same per-case dicts as
+    run_piston_job, in order.
+
+    Anything the batch could not judge reliably (runner error, harness
+    clash on compile, cases cut off by the batch timeout or output cap)
+    is re-run with run_piston_job, so verdicts never depend on batching.
+    """
+    payload, marker = piston_batch.build_batch_payload(
+        language=language,
+        code=code,
+        test_cases=test_cases,
+        case_timeout_ms=limits.run_timeout_ms,
+        run_timeout_ms=min(settings.PISTON_BATCH_RUN_TIMEOUT, settings.PISTON_MAX_RUN_TIMEOUT),
+        compile_timeout_ms=limits.compile_timeout_ms,
+        memory_limit_bytes=limits.memory_limit_bytes,
+    )
+
+    async def run_unbatched(positions: List[int]) -> List[Dict[str, Any]]:
+        return await asyncio.gather(*[
+            run_piston_job(
+                client=client,
+                language=language,
+                code=code,
+                test_case=test_cases[pos],
+                index=start_index + pos,
+                limits=limits,
+            )
+            for pos in positions
+        ])
+
+    input_bytes = sum(len((case.get("input", "") or "").encode("utf-8")) for case in test_cases)
+    if len(test_cases) == 1 or input_bytes > settings.PISTON_BATCH_MAX_INPUT_BYTES:
+        return await run_unbatched(list(range(len(test_cases))))
+
+    try:
+        data = await client.execute(payload)
+    except Exception:
+        return await run_unbatched(list(range(len(test_cases))))
+
+    run_stage: Dict[str, Any] = data.get("run", {}) or {}
+    compile_stage: Dict[str, Any] = data.get("compile", {}) or {}
+
+    if compile_stage and compile_stage.get("code", 0) != 0:
+        # Confirm with the untouched source so the harness can never turn
+        # a valid program into a Compilation Error.
+        first = (await run_unbatched([0]))[0]
+        if first["status"] != "Compilation Error":
+            return [first] + await run_unbatched(list(range(1, len(test_cases))))
+        return [first] + [
+            _compile_error_result(test_cases[pos], start_index + pos, compile_stage)
+            for pos in range(1, len(test_cases))
+        ]
+
+    parsed = piston_batch.parse_batch_output(run_stage, marker, len(test_cases))
+
+    results: List[Optional[Dict[str, Any]]] = [
+        _run_result(test_cases[pos], start_index + pos, stage, limits) if stage else None
+        for pos, stage in enumerate(parsed)
+    ]
+
+    missing = [pos for pos, res in enumerate(results) if res is None]
+    if missing:
+        for pos, res in zip(missing, await run_unbatched(missing)):
+            results[pos] = res
+
+    return results
+
+
+# Called with each per-case result as soon as it is known (judge progress)
+ResultCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def _reported(job: Awaitable[Any], on_result: Optional[ResultCallback]) -> Any:
+    """Awaits a job (one result or a list of them) and reports its results"""
+    outcome = await job
+    if on_result is not None:
+        for res in outcome if isinstance(outcome, list) else [outcome]:
+            await on_result(res)
+    return outcome
+
+
+def _uses_batching(language: str, count: int) -> bool:
+    return (
+        settings.PISTON_BATCH_ENABLED
+        and piston_batch.supports_batching(language)
+        and count > 1
+    )
+
+
+async def execute_test_cases(
+    client: PistonClient,
+    language: str,
+    code: str,
+    test_cases: List[Dict[str, Any]],
+    start_index: int = 1,
+    on_result: Optional[ResultCallback] = None,
+    limits: ExecutionLimits = DEFAULT_LIMITS,
+) -> List[Dict[str, Any]]:
+    """
+    Runs every test case and returns results in order (index is 1-based,
+    counted from `start_index`). Compiled languages go through
+    run_piston_batch in chunks of at most PISTON_BATCH_SIZE cases whose
+    output fits PISTON_OUTPUT_MAX_SIZE; everything else fires one Piston
+    job per case. `on_result` sees each result as it lands.
+    """
+    if _uses_batching(language, len(test_cases)):
+        batches = piston_batch.plan_batches(
+            test_cases, settings.PISTON_BATCH_SIZE, settings.PISTON_OUTPUT_MAX_SIZE
+        )
+        chunks = await asyncio.gather(*[
+            _reported(
+                run_piston_batch(
+                    client=client,
+                    language=language,
+                    code=code,
+                    test_cases=test_cases[start:end],
+                    start_index=start_index + start,
+                    limits=limits,
+                ),
+                on_result,
+            )
+            for start, end in batches
+        ])
+        return [res for chunk in chunks for res in chunk]
+
+    return await asyncio.gather(*[
+        _reported(
+            run_piston_job(
+                client=client,
+                language=language,
+                code=code,
+                test_case=case,
+                index=start_index + i,
+                limits=limits,
+            ),
+            on_result,
+        )
+        for i, case in enumerate(test_cases)
+    ])
+
+
+async def _run_wave(
+    client: PistonClient,
+    language: str,
+    code: str,
+    test_cases: List[Dict[str, Any]],
+    start_index: int,
+    on_result: Optional[ResultCallback] = None,
+    limits: ExecutionLimits = DEFAULT_LIMITS,
+) -> List[Dict[str, Any]]:
+    """
+    One fail-fast wave. Batched languages compile once per wave anyway;
+    for per-case jobs a Compilation Error cancels the jobs still in flight
+    since every other case would fail the same way.
+    """
+    if _uses_batching(language, len(test_cases)):
+        return await execute_test_cases(
+            client, language, code, test_cases, start_index, on_result, limits
+        )
+
+    pending = {
+        asyncio.create_task(
+            _reported(
+                run_piston_job(
+                    client=client,
+                    language=language,
+                    code=code,
+                    test_case=case,
+                    index=start_index + i,
+                    limits=limits,
+                ),
+                on_result,
+            )
+        )
+        for i, case in enumerate(test_cases)
+    }
+    results: List[Dict[str, Any]] = []
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            results.extend(task.result() for task in done)
+            if any(res["status"] == "Compilation Error" for res in results):
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return sorted(results, key=lambda res: res["index"])
+
+
+async def execute_test_cases_fail_fast(
+    client: PistonClient,
+    language: str,
+    code: str,
+    test_cases: List[Dict[str, Any]],
+    on_result: Optional[ResultCallback] = None,
+    limits: ExecutionLimits = DEFAULT_LIMITS,
+) -> List[Dict[str, Any]]:
+    """
+    Fail-fast judging: runs the cases in waves of JUDGE_WAVE_SIZE, in
+    order, and stops after the first wave containing a failure.
+
+    Returns the results up to and including the first failing case, so
+    test_cases_passed counts exactly the cases passed before it no matter
+    how the waves were cut.
+    """
+    wave_size = max(1, settings.JUDGE_WAVE_SIZE)
+    results: List[Dict[str, Any]] = []
+
+    for start in range(0, len(test_cases), wave_size):
+        wave_results = await _run_wave(
+            client=client,
+            language=language,
+            code=code,
+            test_cases=test_cases[start:start + wave_size],
+            start_index=start + 1,
+            on_result=on_result,
+            limits=limits,
+        )
+        results.extend(wave_results)
+
+        failed = [res for res in wave_results if not res["passed"]]
+        if failed:
+            first_failure = min(res["index"] for res in failed)
+            return [res for res in results if res["index"] <= first_failure]
+
+    return results
+
+
+# Priority: Compilation Error > Runtime Error > Time Limit Exceeded >
+#           Memory Limit Exceeded > Wrong Answer > System Error > Accepted
+VERDICT_PRIORITY: Dict[str, int] = {
+    "Compilation Error": 6,
+    "Runtime Error": 5,
+    "Time Limit Exceeded": 4,
+    "Memory Limit Exceeded": 3,
+    "Wrong Answer": 2,
+    "System Error": 1,
+    "Accepted": 0,
+}
+
+
+def verdict_priority(status: str) -> int:
+    return VERDICT_PRIORITY.get(status, 0)
 
 
 # --------------------------
 # 1. RUN SERVICE (Public Only)
 # --------------------------
-async def run_code_service(db: Session, run_request: CodeRunRequest) -> Dict[str, Any]:
+async def run_code_service(run_request: CodeRunRequest) -> Dict[str, Any]:
     """
     RUN endpoint:
       - Uses ONLY public test cases (hidden == False)
       - Executes them in parallel on Piston
       - Returns verdict + per-test-case results for frontend
+      - Only holds a DB connection while loading the test cases, never
+        while Piston is running
     """
     print(f"[DEBUG] Starting run_code_service for problem {run_request.problem_id}")
-    print(f"[DEBUG] Piston URL: {PISTON_API_URL}")
+    print(f"[DEBUG] Piston backends: {piston_client.backend_urls()}")
     print(f"Executing 'Run' (Piston) for Problem {run_request.problem_id}")
 
-    # 1. Fetch Test Cases
-    query = select(TestCases).where(TestCases.problem_id == run_request.problem_id)
-    result = await db.execute(query)
-    test_case_record: Optional[TestCases] = result.scalars().first()
+    # 1. Fetch Test Cases (cached, already split into public/hidden)
+    async with unit_of_work() as db:
+        cached = await test_case_cache.get_test_cases(db, run_request.problem_id)
 
-    if not test_case_record or not test_case_record.test_cases:
+    if not cached:
         return {"error": "Test cases not found"}
 
-    all_cases = test_case_record.test_cases
-    if isinstance(all_cases, str):
-        all_cases = json.loads(all_cases)
-
-    # Filter public only
-    public_cases = [tc for tc in all_cases if not tc.get("hidden", False)]
+    public_cases = list(cached.public)
     if not public_cases:
         return {"error": "No public test cases found."}
 
     language_name = get_piston_language(run_request.language_id)
 
+    # Byte-identical re-Runs are served without touching Piston
+    cache_key = result_cache.result_key(
+        result_cache.RUN_SCOPE,
+        run_request.problem_id,
+        cached.version,
+        language_name,
+        run_request.source_code,
+    )
+    cached_response = await result_cache.get_result(cache_key)
+    if cached_response is not None:
+        return cached_response
+
+    limits = get_execution_limits(cached, language_name)
+
     print(f"[DEBUG] Found {len(public_cases)} public test cases")
     print(f"[DEBUG] Starting parallel execution...")
-    # 2. Run all public cases in parallel
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        tasks = [
-            run_piston_job(
-                client=client,
-                language=language_name,
-                code=run_request.source_code,
-                test_case=case,
-                index=i + 1,
-            )
-            for i, case in enumerate(public_cases)
-        ]
-        results = await asyncio.gather(*tasks)
+    # 2. Run all public cases (shared pooled client, batched when compiled)
+    results = await execute_test_cases(
+        client=piston_client,
+        language=language_name,
+        code=run_request.source_code,
+        test_cases=public_cases,
+        limits=limits,
+    )
 
     # 3. Aggregate results for frontend
     formatted_results: List[Dict[str, Any]] = []
@@ -195,17 +573,11 @@ async def run_code_service(db: Session, run_request: CodeRunRequest) -> Dict[str
     for res in results:
         status = res["status"]
         if not res["passed"]:
-            # Verdict priority for RUN:
-            # Compilation Error > Runtime Error > Wrong Answer > System Error
-            if final_verdict == "Accepted":
-                final_verdict = status
-            elif final_verdict == "Wrong Answer" and status in (
-                "Runtime Error",
-                "Compilation Error",
+            # Keep the highest-priority failure (see VERDICT_PRIORITY)
+            if final_verdict == "Accepted" or (
+                verdict_priority(status) > verdict_priority(final_verdict)
             ):
                 final_verdict = status
-            elif final_verdict == "Runtime Error" and status == "Compilation Error":
-                final_verdict = status
 
         formatted_results.append(
             {
@@ -224,91 +596,106 @@ async def run_code_service(db: Session, run_request: CodeRunRequest) -> Dict[str
 
     print(f"[DEBUG] Execution complete!")
 
-    return {
+    response = {
         "verdict": final_verdict,
         "total_public_cases": len(public_cases),
         "results": formatted_results,
     }
+    if result_cache.is_cacheable(results, limits):
+        await result_cache.store_result(cache_key, response)
+
+    return response
 
 
 # --------------------------
 # 2. SUBMIT SERVICE (All Cases)
 # --------------------------
 async def submit_solution_service(
-    db: Session, submission_in: SolutionSubmitRequest, user_id: int
+    submission_in: SolutionSubmitRequest, user_id: int
 ) -> Submission | Dict[str, Any]:
     """
     SUBMIT endpoint:
-      - Uses ALL test cases (public + hidden)
-      - Executes them in parallel on Piston
-      - Stores a Submission row with final verdict & basic info
-      - Returns the Submission instance
+      - Stores a Submission row with verdict "Queued"
+      - Wakes the judge workers (app.services.judge_queue)
+      - Returns the Submission instance straight away; the verdict is
+        written later by judge_submission()
+      - Exact resubmits get their verdict from the result cache and are
+        stored already judged
+      - Each DB step is its own short unit of work; no connection is held
+        across the Redis lookups in between
     """
-    print(f"Executing 'Submit' (Piston) for Problem {submission_in.problem_id}")
+    print(f"Queueing 'Submit' (Piston) for Problem {submission_in.problem_id}")
 
-    # 1. Fetch all test cases
-    query = select(TestCases).where(TestCases.problem_id == submission_in.problem_id)
-    result = await db.execute(query)
-    test_case_record: Optional[TestCases] = result.scalars().first()
+    # 1. Make sure the problem can be judged at all
+    async with unit_of_work() as db:
+        cached = await test_case_cache.get_test_cases(db, submission_in.problem_id)
 
-    if not test_case_record or not test_case_record.test_cases:
+    if not cached:
         return {"error": "Test cases not found"}
 
-    all_cases = test_case_record.test_cases
-    if isinstance(all_cases, str):
-        all_cases = json.loads(all_cases)
+    cached_summary = await result_cache.get_result(
+        _submit_cache_key(
+            submission_in.problem_id,
+            cached.version,
+            submission_in.language_id,
+            submission_in.source_code,
+        )
+    )
 
-    # 2. Create initial Submission record (Judging)
+    # 2. Create the Submission record (Queued, or judged from the cache)
     new_submission = Submission(
         user_id=user_id,
         language_id=submission_in.language_id,
         source_code=submission_in.source_code,
         problem_id=submission_in.problem_id,
-        verdict="Judging",
-        total_test_cases=len(all_cases),
+        verdict=judge_queue.QUEUED,
+        total_test_cases=len(cached.cases),
         test_cases_passed=0,
     )
-    db.add(new_submission)
-    await db.commit()
-    await db.refresh(new_submission)
+    if cached_summary is not None:
+        for field, value in cached_summary.items():
+            setattr(new_submission, field, value)
+
+    async with unit_of_work() as db:
+        db.add(new_submission)
+        await db.flush()
+        await db.refresh(new_submission)
+
+    # 3. Hand it to the judge workers
+    if cached_summary is None:
+        judge_queue.notify()
+    return new_submission
 
-    # 3. Execute ALL test cases in parallel
-    language_name = get_piston_language(submission_in.language_id)
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        tasks = [
-            run_piston_job(
-                client=client,
-                language=language_name,
-                code=submission_in.source_code,
-                test_case=case,
-                index=i + 1,
-            )
-            for i, case in enumerate(all_cases)
-        ]
-        results = await asyncio.gather(*tasks)
+async def get_submission_service(
+    db: Session, submission_id: int, user_id: int
+) -> Optional[Submission]:
+    """Fetch one of the user's submissions (used to poll for the verdict)"""
+    query = select(Submission).where(
+        Submission.submission_id == submission_id,
+        Submission.user_id == user_id,
+    )
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
 
-    # 4. Determine final verdict & error message
+# --------------------------
+# 3. JUDGE (runs inside the judge workers)
+# --------------------------
+def summarize_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Folds per-test-case results into the fields stored on a Submission:
+    verdict, error_message, test_cases_passed, execution_time, memory_used
+    """
     final_verdict = "Accepted"
     error_message: Optional[str] = None
     passed_count = 0
     max_time = 0.0
     max_memory = 0
 
-    # Priority: Compilation Error > Runtime Error > Wrong Answer > System Error > Accepted
-    def verdict_priority(status: str) -> int:
-        order = {
-            "Compilation Error": 4,
-            "Runtime Error": 3,
-            "Wrong Answer": 2,
-            "System Error": 1,
-            "Accepted": 0,
-        }
-        return order.get(status, 0)
-
     worst_result: Optional[Dict[str, Any]] = None
 
-    for i, res in enumerate(results):
+    for res in results:
         # track time/memory
         max_time = max(max_time, float(res.get("time") or 0.0))
         max_memory = max(max_memory, int(res.get("memory") or 0))
@@ -323,10 +710,7 @@ async def submit_solution_service(
         ):
             worst_result = res
 
-    if worst_result is None:
-        # All passed
-        final_verdict = "Accepted"
-    else:
+    if worst_result is not None:
         status = worst_result["status"]
         final_verdict = status
         is_hidden = bool(worst_result.get("hidden", False))
@@ -344,20 +728,120 @@ async def submit_solution_service(
                 )
             elif status == "Runtime Error":
                 error_message = worst_result.get("stderr") or "Runtime Error"
+            elif status in ("Time Limit Exceeded", "Memory Limit Exceeded"):
+                error_message = f"{status} on Test Case {worst_result['index']}"
             else:
                 error_message = status
 
-    # 5. Update submission in DB
-    new_submission.verdict = final_verdict
-    new_submission.stderr = error_message
-    new_submission.test_cases_passed = passed_count
+    return {
+        "verdict": final_verdict,
+        "error_message": error_message,
+        "test_cases_passed": passed_count,
+        "execution_time": max_time,
+        "memory_used": max_memory,
+    }
 
-    # These fields may or may not exist in your model; if they do, we set them.
-    if hasattr(new_submission, "execution_time"):
-        new_submission.execution_time = max_time
-    if hasattr(new_submission, "memory_used"):
-        new_submission.memory_used = max_memory
 
-    await db.commit()
-    await db.refresh(new_submission)
-    return new_submission
+def _submit_cache_key(problem_id: int, version: str, language_id: int, code: str) -> str:
+    scope = (
+        result_cache.SUBMIT_FAIL_FAST_SCOPE if settings.JUDGE_FAIL_FAST
+        else result_cache.SUBMIT_SCOPE
+    )
+    return result_cache.result_key(
+        scope, problem_id, version, get_piston_language(language_id), code
+    )
+
+
+def _progress_reporter(submission: Submission, total: int) -> ResultCallback:
+    """Streams each finished test case to the submitter's websocket"""
+    passed_count = 0
+
+    async def report(res: Dict[str, Any]) -> None:
+        nonlocal passed_count
+        if res["passed"]:
+            passed_count += 1
+        await manager.send_to_user(submission.user_id, {
+            "type": "judge_progress",
+            "submission_id": submission.submission_id,
+            "test_case_index": res["index"],
+            "status": res["status"],
+            "passed_count": passed_count,
+            "total_test_cases": total,
+        })
+
+    return report
+
+
+async def judge_submission(submission: Submission) -> Dict[str, Any]:
+    """
+    Judges a claimed submission against ALL test cases (public + hidden)
+    and writes the verdict back. With JUDGE_FAIL_FAST it stops at the
+    first failing case. Only opens a DB session around the actual SQL;
+    nothing is held while Piston is running.
+
+    Progress is pushed over /ws as each case finishes ("judge_progress"),
+    followed by the final "judge_result".
+    """
+    print(f"Judging submission {submission.submission_id} (Problem {submission.problem_id})")
+
+    # 1. Fetch all test cases
+    async with AsyncSessionLocal() as db:
+        cached = await test_case_cache.get_test_cases(db, submission.problem_id)
+
+    if not cached:
+        summary = {
+            "verdict": "System Error",
+            "error_message": "Test cases not found",
+            "test_cases_passed": 0,
+            "execution_time": 0.0,
+            "memory_used": 0,
+        }
+    else:
+        # 2. Execute ALL test cases (or until the first failure)
+        execute = (
+            execute_test_cases_fail_fast if settings.JUDGE_FAIL_FAST else execute_test_cases
+        )
+        language_name = get_piston_language(submission.language_id)
+        limits = get_execution_limits(cached, language_name)
+        results = await execute(
+            client=piston_client,
+            language=language_name,
+            code=submission.source_code,
+            test_cases=list(cached.cases),
+            on_result=_progress_reporter(submission, len(cached.cases)),
+            limits=limits,
+        )
+        # 3. Determine final verdict & error message
+        summary = summarize_results(results)
+
+        if result_cache.is_cacheable(results, limits):
+            await result_cache.store_result(
+                _submit_cache_key(
+                    submission.problem_id,
+                    cached.version,
+                    submission.language_id,
+                    submission.source_code,
+                ),
+                summary,
+            )
+
+    # 4. Update submission in DB
+    await record_verdict(submission, summary)
+    return summary
+
+
+async def record_verdict(submission: Submission, summary: Dict[str, Any]) -> None:
+    """Writes a judged submission's verdict and tells its owner over /ws"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Submission)
+            .where(Submission.submission_id == submission.submission_id)
+            .values(judged_at=func.now(), **summary)
+        )
+        await db.commit()
+
+    await manager.send_to_user(submission.user_id, {
+        "type": "judge_result",
+        "submission_id": submission.submission_id,
+        **summary,
+    })
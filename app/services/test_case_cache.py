@@ -0,0 +1,229 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.redis import redis_client
+from app.models.problems import Problems
+from app.models.test_cases import TestCases
+
+# --------------------------
+# Test case cache
+# --------------------------
+# Two tiers in front of the test_cases table:
+#   1. in-process TTL/LRU cache bounded by (approximate) size in bytes
+#   2. Redis, keyed by problem id + updated_at version
+# Every lookup first reads the current version (test_cases.updated_at and
+# problems.updated_at, one indexed row) and only accepts a cached entry of
+# that version, so edits made outside the ORM (the migrated schema bumps
+# updated_at with triggers) are picked up on the next lookup.
+# Entries are split into public/hidden once when they are loaded, so the
+# Run, Submit and problem endpoints never filter the full list themselves.
+# The problem's time/memory limits travel with the cases for the judge.
+
+# v3: no version pointer, the version is read from the database
+DATA_KEY = "testcases:v3:{problem_id}:{version}"
+
+
+@dataclass(frozen=True)
+class ProblemTestCases:
+    problem_id: int
+    version: str
+    cases: Tuple[Dict[str, Any], ...]   # original order (public + hidden)
+    public: Tuple[Dict[str, Any], ...]  # run by Run
+    hidden: Tuple[Dict[str, Any], ...]
+    samples: Tuple[Dict[str, Any], ...] # shown with the problem (hidden is False)
+    time_limit: int                     # ms (Problems.time_limit)
+    memory_limit: int                   # MB (Problems.memory_limit)
+    size: int                           # bytes of the serialized cases
+
+    def serialize(self) -> str:
+        return json.dumps({
+            "cases": self.cases,
+            "time_limit": self.time_limit,
+            "memory_limit": self.memory_limit,
+        })
+
+
+def _build_entry(
+    problem_id: int,
+    version: str,
+    raw_cases: Any,
+    time_limit: int,
+    memory_limit: int,
+) -> ProblemTestCases:
+    if isinstance(raw_cases, str):
+        raw_cases = json.loads(raw_cases)
+    cases = tuple(raw_cases or ())
+    return ProblemTestCases(
+        problem_id=problem_id,
+        version=version,
+        cases=cases,
+        public=tuple(tc for tc in cases if not tc.get("hidden", False)),
+        hidden=tuple(tc for tc in cases if tc.get("hidden", False)),
+        samples=tuple(tc for tc in cases if tc.get("hidden") is False),
+        time_limit=time_limit,
+        memory_limit=memory_limit,
+        size=len(json.dumps(cases)),
+    )
+
+
+_local_cache: TTLCache = TTLCache(
+    maxsize=settings.TEST_CASE_CACHE_MAX_BYTES,
+    ttl=settings.TEST_CASE_CACHE_LOCAL_TTL,
+    getsizeof=lambda entry: max(1, entry.size),
+)
+
+
+def _store_local(entry: ProblemTestCases) -> None:
+    try:
+        _local_cache[entry.problem_id] = entry
+    except ValueError:
+        # Larger than the whole cache budget; keep serving it from Redis
+        pass
+
+
+async def _load_from_redis(problem_id: int, version: str) -> Optional[ProblemTestCases]:
+    try:
+        blob = await redis_client.get(
+            DATA_KEY.format(problem_id=problem_id, version=version)
+        )
+    except RedisError as e:
+        print(f"[cache] Redis unavailable for test cases: {e}")
+        return None
+
+    if blob is None:
+        return None
+
+    data = json.loads(blob)
+    return _build_entry(
+        problem_id, version, data["cases"], data["time_limit"], data["memory_limit"]
+    )
+
+
+async def _store_redis(entry: ProblemTestCases) -> None:
+    try:
+        await redis_client.set(
+            DATA_KEY.format(problem_id=entry.problem_id, version=entry.version),
+            entry.serialize(),
+            ex=settings.TEST_CASE_CACHE_REDIS_TTL,
+        )
+    except RedisError as e:
+        print(f"[cache] Failed to store test cases in Redis: {e}")
+
+
+def _version(test_cases_updated_at, problem_updated_at) -> str:
+    # Limits live on the problem row, so its updated_at is part of the version
+    return ":".join(
+        str(ts.timestamp()) if ts else "0"
+        for ts in (test_cases_updated_at, problem_updated_at)
+    )
+
+
+async def _current_version(db: Session, problem_id: int) -> Optional[str]:
+    """The version the database holds now, or None if there are no test cases"""
+    query = (
+        select(TestCases.updated_at, Problems.updated_at.label("problem_updated_at"))
+        .join(Problems, Problems.problem_id == TestCases.problem_id)
+        .where(TestCases.problem_id == problem_id)
+        .order_by(TestCases.test_cases_id)
+        .limit(1)
+    )
+    row = (await db.execute(query)).first()
+    if not row:
+        return None
+    return _version(row.updated_at, row.problem_updated_at)
+
+
+async def _load_from_db(db: Session, problem_id: int) -> Optional[ProblemTestCases]:
+    query = (
+        select(
+            TestCases.test_cases,
+            TestCases.updated_at,
+            Problems.time_limit,
+            Problems.memory_limit,
+            Problems.updated_at.label("problem_updated_at"),
+        )
+        .join(Problems, Problems.problem_id == TestCases.problem_id)
+        .where(TestCases.problem_id == problem_id)
+        .order_by(TestCases.test_cases_id)
+        .limit(1)
+    )
+    result = await db.execute(query)
+    row = result.first()
+
+    if not row or not row.test_cases:
+        return None
+
+    version = _version(row.updated_at, row.problem_updated_at)
+    return _build_entry(
+        problem_id, version, row.test_cases, row.time_limit, row.memory_limit
+    )
+
+
+async def get_test_cases(db: Session, problem_id: int) -> Optional[ProblemTestCases]:
+    """
+    Returns the problem's test cases (already split into public/hidden),
+    or None if the problem has none. Costs one small version query; the
+    cases themselves only come from the database on a full miss.
+    """
+    version = await _current_version(db, problem_id)
+    if version is None:
+        _local_cache.pop(problem_id, None)
+        return None
+
+    entry = _local_cache.get(problem_id)
+    if entry is not None and entry.version == version:
+        return entry
+
+    entry = await _load_from_redis(problem_id, version)
+    if entry is None:
+        entry = await _load_from_db(db, problem_id)
+        if entry is None:
+            return None
+        await _store_redis(entry)
+
+    _store_local(entry)
+    return entry
+
+
+def invalidate_test_cases(problem_id: int) -> None:
+    """
+    Drops this process's cached test cases for a problem. Other processes
+    and Redis need nothing: their entries no longer match the version.
+    """
+    _local_cache.pop(problem_id, None)
+
+
+# Any ORM write to test_cases (or to the problem row holding the limits)
+# drops that problem's local entry once the transaction commits, to free
+# it early; the version check is what keeps readers correct.
+_PENDING_KEY = "test_case_cache_invalidate"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_problems(session: Session, flush_context) -> None:
+    changed = [
+        obj.problem_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, (TestCases, Problems))
+    ]
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_problems(session: Session) -> None:
+    for problem_id in session.info.pop(_PENDING_KEY, None) or ():
+        invalidate_test_cases(problem_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_problems(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -81,17 +81,6 @@ class UserService:
             await db.rollback()
             raise e
 
-    @staticmethod
-    async def update_last_login(db: AsyncSession, user_id: int) -> None:
-        """Update user's last login timestamp"""
-        from sqlalchemy.sql import func
-        result = await db.execute(select(User).where(User.user_id == user_id))
-        user = result.scalar_one_or_none()
-
-        if user:
-            user.last_login = func.now()
-            await db.commit()
-
     @staticmethod
     async def get_users_paginated(
         db: AsyncSession,
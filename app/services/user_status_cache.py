@@ -0,0 +1,131 @@
+import asyncio
+from typing import Optional
+
+from cachetools import TTLCache
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.core.redis import redis_client
+from app.database import AsyncSessionLocal
+from app.models.user import User
+
+# --------------------------
+# User status cache
+# --------------------------
+# "Does this user exist and is the account active?" is asked on every
+# authenticated request and every websocket connect, right after the JWT
+# has been verified. Answers (including "no") are cached for a few seconds
+# in-process and in Redis, so reconnect storms don't turn into DB storms:
+#   1. process-local TTLCache
+#   2. Redis, shared by all workers
+#   3. the users table
+# Deactivating or deleting a user through the ORM drops the entry.
+
+STATUS_KEY = "user:status:{user_id}"
+
+_local_cache: TTLCache = TTLCache(
+    maxsize=settings.USER_STATUS_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_STATUS_CACHE_LOCAL_TTL,
+)
+
+
+async def _load_from_db(db: AsyncSession, user_id: int) -> bool:
+    result = await db.execute(select(User.is_active).where(User.user_id == user_id))
+    return bool(result.scalar_one_or_none())
+
+
+async def is_user_active(user_id: int, db: Optional[AsyncSession] = None) -> bool:
+    """
+    True if the user exists and is active. `db` is only used on a full
+    miss; without one a short-lived session is opened.
+    """
+    active = _local_cache.get(user_id)
+    if active is not None:
+        metrics.incr("user_status_cache.hit.local")
+        return active
+
+    try:
+        cached = await redis_client.get(STATUS_KEY.format(user_id=user_id))
+    except RedisError as e:
+        print(f"[cache] Redis unavailable for user status: {e}")
+        cached = None
+
+    if cached is not None:
+        metrics.incr("user_status_cache.hit.redis")
+        active = cached == "1"
+    else:
+        metrics.incr("user_status_cache.miss")
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                active = await _load_from_db(session, user_id)
+        else:
+            active = await _load_from_db(db, user_id)
+        try:
+            await redis_client.set(
+                STATUS_KEY.format(user_id=user_id),
+                "1" if active else "0",
+                ex=settings.USER_STATUS_CACHE_REDIS_TTL,
+            )
+        except RedisError as e:
+            print(f"[cache] Failed to store user status in Redis: {e}")
+
+    _local_cache[user_id] = active
+    return active
+
+
+async def invalidate_user_status(user_id: int) -> None:
+    """
+    Drops the cached status. The local tier of other processes expires
+    within USER_STATUS_CACHE_LOCAL_TTL seconds.
+    """
+    _local_cache.pop(user_id, None)
+    try:
+        await redis_client.delete(STATUS_KEY.format(user_id=user_id))
+    except RedisError as e:
+        print(f"[cache] Failed to invalidate user status in Redis: {e}")
+
+
+# Same commit-time invalidation as app.services.test_case_cache, limited
+# to the writes that can change the answer.
+_PENDING_KEY = "user_status_cache_invalidate"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context) -> None:
+    changed = [
+        obj.user_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, User) and (
+            obj in session.new
+            or obj in session.deleted
+            or inspect(obj).attrs.is_active.history.has_changes()
+        )
+    ]
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    user_ids = session.info.pop(_PENDING_KEY, None)
+    if not user_ids:
+        return
+
+    for user_id in user_ids:
+        _local_cache.pop(user_id, None)
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    for user_id in user_ids:
+        loop.create_task(invalidate_user_status(user_id))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,19 +1,86 @@
-from typing import List
+import time
+from typing import Dict, Iterable, List, Tuple
+from app.config import settings
+from app.core.metrics import metrics
 from app.core.redis import redis_client
 
-ONLINE_USERS_KEY = "online_users"
+# --------------------------
+# Presence
+# --------------------------
+# Every websocket is a connection entry that expires unless it is
+# refreshed by its process' heartbeat, so a crashed worker's users go
+# offline on their own after PRESENCE_TTL seconds.
+#   presence:conns:{user_id}  ZSET connection_id -> expiry (epoch seconds)
+#   presence:online           ZSET user_id -> latest expiry of its connections
+# A user is online while their score in presence:online is in the future;
+# the number of live connection entries is the reference count across
+# tabs and workers.
 
-async def add_online_user(user_id: int):
-    await redis_client.sadd(ONLINE_USERS_KEY, user_id)
+ONLINE_USERS_KEY = "presence:online"
+CONNECTIONS_KEY = "presence:conns:{user_id}"
 
-async def remove_online_user(user_id: int):
-    await redis_client.srem(ONLINE_USERS_KEY, user_id)
+# Drop one connection and recompute the user's expiry from the ones left
+# (atomic, so a tab opening on another worker can't be lost in between).
+_REMOVE_CONNECTION = redis_client.register_script("""
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local latest = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+if #latest == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[3])
+    return 0
+end
+redis.call('ZADD', KEYS[2], latest[2], ARGV[3])
+return redis.call('ZCARD', KEYS[1])
+""")
 
-async def get_online_users() -> List[int]:
-    users = await redis_client.smembers(ONLINE_USERS_KEY)
-    return [int(u) for u in users]
+async def refresh_connections(connections: Iterable[Tuple[int, str]]):
+    """Adds or extends connection entries in one pipeline"""
+    expiry = time.time() + settings.PRESENCE_TTL
+    async with redis_client.pipeline(transaction=False) as pipe:
+        count = 0
+        for user_id, connection_id in connections:
+            key = CONNECTIONS_KEY.format(user_id=user_id)
+            pipe.zadd(key, {connection_id: expiry})
+            pipe.expire(key, settings.PRESENCE_TTL)
+            pipe.zadd(ONLINE_USERS_KEY, {user_id: expiry}, gt=True)
+            count += 1
+        if count:
+            await pipe.execute()
+
+async def add_connection(user_id: int, connection_id: str):
+    await refresh_connections([(user_id, connection_id)])
+
+async def remove_connection(user_id: int, connection_id: str) -> int:
+    """Returns how many connections the user still has"""
+    return int(await _REMOVE_CONNECTION(
+        keys=[CONNECTIONS_KEY.format(user_id=user_id), ONLINE_USERS_KEY],
+        args=[connection_id, time.time(), user_id],
+        client=redis_client,
+    ))
+
+async def is_user_online(user_id: int) -> bool:
+    expiry = await redis_client.zscore(ONLINE_USERS_KEY, user_id)
+    return expiry is not None and expiry > time.time()
+
+async def get_online_status(user_ids: List[int]) -> Dict[int, bool]:
+    """Presence for many users in one ZMSCORE (cost scales with len(user_ids))"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    now = time.time()
+    expiries = await redis_client.zmscore(ONLINE_USERS_KEY, user_ids)
+    return {
+        uid: expiry is not None and expiry > now
+        for uid, expiry in zip(user_ids, expiries)
+    }
 
 async def get_online_friends(user_id: int, friend_ids: List[int]) -> List[int]:
-    online_users = await redis_client.smembers(ONLINE_USERS_KEY)
-    online_users = set(map(int, online_users))
-    return list(online_users.intersection(set(friend_ids)))
\ No newline at end of file
+    status = await get_online_status(friend_ids)
+    return [friend_id for friend_id, online in status.items() if online]
+
+async def sweep_expired() -> int:
+    """Removes users whose connections all stopped heartbeating"""
+    removed = await redis_client.zremrangebyscore(ONLINE_USERS_KEY, "-inf", time.time())
+    if removed:
+        metrics.incr("presence.swept", removed)
+    return removed
\ No newline at end of file
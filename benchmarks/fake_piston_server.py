@@ -0,0 +1,76 @@
+"""
+Local HTTP stand-in for a Piston runner.
+
+    python -m benchmarks.fake_piston_server [--port 2000] [--latency 0.05]
+        [--compile-cost 0.2] [--failure-rate 0.01]
+
+Serves POST /api/v2/execute and GET /api/v2/runtimes from
+app.core.fake_piston.FakePiston, so the API can be driven without a real
+runner. Point the API at it with
+PISTON_API_URL=http://127.0.0.1:2000/api/v2/execute.
+Simulated runner failures are answered with HTTP 503; jobs real Piston
+would reject (timeouts above its limits) with HTTP 400.
+"""
+import argparse
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.core.fake_piston import (
+    MAX_RUN_TIMEOUT,
+    OUTPUT_MAX_SIZE,
+    FakePiston,
+    RunnerRejected,
+    RunnerUnavailable,
+)
+
+
+def create_stub(runner: FakePiston) -> FastAPI:
+    stub = FastAPI(title="Fake Piston", docs_url=None, redoc_url=None)
+
+    @stub.post("/api/v2/execute")
+    async def execute(payload: Dict[str, Any]):
+        try:
+            return await runner.execute(payload)
+        except RunnerUnavailable as e:
+            return JSONResponse(status_code=503, content={"message": str(e)})
+        except RunnerRejected as e:
+            return JSONResponse(status_code=400, content={"message": str(e)})
+
+    @stub.get("/api/v2/runtimes")
+    async def runtimes():
+        return await runner.runtimes()
+
+    @stub.get("/stats")
+    async def stats():
+        return {"calls": runner.calls}
+
+    return stub
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Piston runner")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every request")
+    parser.add_argument("--compile-cost", type=float, default=0.0,
+                        help="extra seconds for compiled languages")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="probability (0..1) of answering 503")
+    parser.add_argument("--max-run-timeout", type=int, default=MAX_RUN_TIMEOUT,
+                        help="largest run_timeout (ms) accepted, like PISTON_RUN_TIMEOUT")
+    parser.add_argument("--output-max-size", type=int, default=OUTPUT_MAX_SIZE,
+                        help="chars per stream before a run is killed, like PISTON_OUTPUT_MAX_SIZE")
+    args = parser.parse_args()
+
+    runner = FakePiston(
+        latency=args.latency,
+        compile_cost=args.compile_cost,
+        failure_rate=args.failure_rate,
+        max_run_timeout=args.max_run_timeout,
+        output_max_size=args.output_max_size,
+    )
+    uvicorn.run(create_stub(runner), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,421 @@
+"""
+Judge throughput / latency benchmark.
+
+    python -m benchmarks.judge_bench [--modes run,submit] [--concurrency 1,8,32]
+        [--requests 200] [--language 71] [--test-cases 10]
+        [--latency 0.05] [--compile-cost 0.2] [--failure-rate 0]
+        [--app-env DB_POOL_SIZE=5 --app-env DB_POOL_PRE_PING=false]
+        [--json results.json]
+
+Starts the fake Piston stub (benchmarks.fake_piston_server) and the API
+under uvicorn on local ports, seeds a benchmark user and an echo problem,
+then drives POST /api/v1/submission/run and /submit at each concurrency
+level. Submit latency runs until the judge stores the final verdict
+(polled through GET /submission/{id}, which adds a few pool checkouts).
+
+Every request sends a distinct source, so the result cache never answers;
+pass --repeat-source to measure the cached path instead.
+
+Needs the API's environment (DATABASE_URL, SECRET_KEY, ... and Redis).
+--app-env overrides settings for the started API only, e.g. to compare
+pool sizes, DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE or DB_PGBOUNCER
+(watch checkouts/req, pool waits and wait/hold ms per request).
+With --app-url an already running API is used and nothing is started; it
+must be pointed at a runner by whoever started it.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import MetaData, Table, insert
+from sqlalchemy.future import select
+
+from app.core.security import create_access_token
+from app.database import AsyncSessionLocal, engine
+from app.models.problems import Problems
+from app.models.test_cases import TestCases
+from app.models.user import User
+from app.services.judge_queue import JUDGING, QUEUED
+
+BENCH_EMAIL = "bench@codered.local"
+BENCH_USERNAME = "codered_bench"
+BENCH_PROBLEM_TITLE = "[bench] echo"
+
+POLL_INTERVAL = 0.05  # seconds between GET /submission/{id} polls
+STARTUP_TIMEOUT = 60  # seconds to wait for a started server to answer
+
+# Programs that print their stdin back (what the echo problem expects, and
+# what the fake runner does regardless of the source)
+ECHO_PROGRAMS: Dict[int, str] = {
+    71: "import sys\nsys.stdout.write(sys.stdin.read())\n",
+    50: (
+        "#include <stdio.h>\n"
+        "int main(void) {\n"
+        "    int c;\n"
+        "    while ((c = getchar()) != EOF) putchar(c);\n"
+        "    return 0;\n"
+        "}\n"
+    ),
+    54: (
+        "#include <iostream>\n"
+        "int main() {\n"
+        "    std::cout << std::cin.rdbuf();\n"
+        "    return 0;\n"
+        "}\n"
+    ),
+    62: (
+        "public class Main {\n"
+        "    public static void main(String[] args) throws Exception {\n"
+        "        System.in.transferTo(System.out);\n"
+        "    }\n"
+        "}\n"
+    ),
+    63: "process.stdin.pipe(process.stdout);\n",
+}
+
+COMMENT_PREFIX: Dict[int, str] = {71: "#"}  # everything else uses //
+
+# /metrics counters compared before and after each level
+COUNTERS = (
+    "piston.requests",
+    "db.pool.checkouts",
+    "db.pool.waits",
+    "db.pool.wait_seconds",
+    "db.pool.hold_seconds",
+)
+
+
+# --------------------------
+# Results
+# --------------------------
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (0 for an empty sample)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+@dataclass
+class LevelResult:
+    mode: str
+    concurrency: int
+    requests: int
+    seconds: float = 0.0
+    errors: int = 0
+    latencies: List[float] = field(default_factory=list)
+    counters: Dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        done = max(1, len(self.latencies))
+        return {
+            "mode": self.mode,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "throughput": len(self.latencies) / self.seconds if self.seconds else 0.0,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p95_ms": percentile(self.latencies, 95) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+            "executor_calls_per_request": self.counters.get("piston.requests", 0) / done,
+            "pool_checkouts_per_request": self.counters.get("db.pool.checkouts", 0) / done,
+            "pool_waits": self.counters.get("db.pool.waits", 0),
+            "pool_wait_ms_per_request": self.counters.get("db.pool.wait_seconds", 0) * 1000 / done,
+            "pool_hold_ms_per_request": self.counters.get("db.pool.hold_seconds", 0) * 1000 / done,
+        }
+
+
+def print_table(summaries: List[Dict[str, Any]]) -> None:
+    header = (
+        f"{'mode':<7}{'conc':>5}{'reqs':>6}{'err':>5}{'req/s':>9}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'calls/req':>11}{'checkouts/req':>15}{'pool waits':>12}{'wait ms/req':>13}{'hold ms/req':>13}"
+    )
+    print(header)
+    print("-" * len(header))
+    for s in summaries:
+        print(
+            f"{s['mode']:<7}{s['concurrency']:>5}{s['requests']:>6}{s['errors']:>5}"
+            f"{s['throughput']:>9.1f}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}"
+            f"{s['executor_calls_per_request']:>11.2f}{s['pool_checkouts_per_request']:>15.2f}"
+            f"{s['pool_waits']:>12.0f}{s['pool_wait_ms_per_request']:>13.2f}"
+            f"{s['pool_hold_ms_per_request']:>13.2f}"
+        )
+
+
+# --------------------------
+# Setup: servers and seed data
+# --------------------------
+def start_process(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], env={**os.environ, **env})
+
+
+async def wait_until_up(url: str, process: Optional[subprocess.Popen]) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                await http.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {STARTUP_TIMEOUT}s")
+
+
+async def seed(test_case_count: int) -> tuple[int, int]:
+    """Creates (or reuses) the benchmark user and echo problem"""
+    cases = [
+        {"input": f"{i}\n", "output": f"{i}", "hidden": i > 2}
+        for i in range(1, test_case_count + 1)
+    ]
+
+    async with AsyncSessionLocal() as db:
+        user = (
+            await db.execute(select(User).where(User.email == BENCH_EMAIL))
+        ).scalar_one_or_none()
+        if user is None:
+            user = User(
+                email=BENCH_EMAIL,
+                username=BENCH_USERNAME,
+                profile_complete=True,
+            )
+            db.add(user)
+            await db.flush()
+
+        problem_id = (
+            await db.execute(
+                select(Problems.problem_id).where(Problems.title == BENCH_PROBLEM_TITLE)
+            )
+        ).scalar()
+        if problem_id is None:
+            # Reuse a real topic in case problems.topic_id is a foreign key
+            topic_id = (await db.execute(select(Problems.topic_id).limit(1))).scalar()
+            values = dict(
+                title=BENCH_PROBLEM_TITLE,
+                description="Print the input back.",
+                # documents/migrations/problems.sql: 'Easy' with 50-200 points
+                difficulty_level="Easy",
+                points=100,
+                topic_id=topic_id or 1,
+                time_limit=1000,
+                memory_limit=256,
+                # Keep it out of the random problem picker
+                is_active=False,
+            )
+            # The migrated schema has a NOT NULL problems.created_by that the
+            # model doesn't map (create_all databases don't have it)
+            problems = await db.run_sync(
+                lambda session: Table("problems", MetaData(), autoload_with=session.connection())
+            )
+            if "created_by" in problems.c:
+                values["created_by"] = user.user_id
+            problem_id = (
+                await db.execute(
+                    insert(problems).values(**values).returning(problems.c.problem_id)
+                )
+            ).scalar_one()
+
+        row = (
+            await db.execute(select(TestCases).where(TestCases.problem_id == problem_id))
+        ).scalars().first()
+        if row is None:
+            db.add(TestCases(problem_id=problem_id, test_cases=cases))
+        elif row.test_cases != cases:
+            row.test_cases = cases
+
+        await db.commit()
+        return user.user_id, problem_id
+
+
+# --------------------------
+# Load
+# --------------------------
+def make_source(language_id: int, tag: Optional[str]) -> str:
+    source = ECHO_PROGRAMS[language_id]
+    if tag is None:
+        return source
+    return f"{source}{COMMENT_PREFIX.get(language_id, '//')} bench {tag}\n"
+
+
+async def get_counters(http: httpx.AsyncClient) -> Dict[str, float]:
+    response = await http.get("/metrics")
+    response.raise_for_status()
+    counters = response.json().get("counters", {})
+    return {name: counters.get(name, 0) for name in COUNTERS}
+
+
+async def run_once(http: httpx.AsyncClient, body: Dict[str, Any]) -> None:
+    response = await http.post("/api/v1/submission/run", json=body)
+    response.raise_for_status()
+
+
+async def submit_once(http: httpx.AsyncClient, body: Dict[str, Any]) -> None:
+    response = await http.post("/api/v1/submission/submit", json=body)
+    response.raise_for_status()
+    submission = response.json()
+
+    while submission["verdict"] in (QUEUED, JUDGING):
+        await asyncio.sleep(POLL_INTERVAL)
+        response = await http.get(f"/api/v1/submission/{submission['submission_id']}")
+        response.raise_for_status()
+        submission = response.json()
+
+
+async def run_level(
+    http: httpx.AsyncClient,
+    mode: str,
+    concurrency: int,
+    total: int,
+    problem_id: int,
+    language_id: int,
+    nonce: Optional[str],
+) -> LevelResult:
+    result = LevelResult(mode=mode, concurrency=concurrency, requests=total)
+    job = run_once if mode == "run" else submit_once
+    numbers = itertools.count()
+
+    async def worker() -> None:
+        while (n := next(numbers)) < total:
+            tag = None if nonce is None else f"{nonce}-{mode}-{concurrency}-{n}"
+            body = {
+                "source_code": make_source(language_id, tag),
+                "language_id": language_id,
+                "problem_id": problem_id,
+            }
+            started = time.perf_counter()
+            try:
+                await job(http, body)
+            except httpx.HTTPError as e:
+                result.errors += 1
+                print(f"[bench] {mode} #{n} failed: {e}")
+                continue
+            result.latencies.append(time.perf_counter() - started)
+
+    before = await get_counters(http)
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    result.seconds = time.perf_counter() - started
+    after = await get_counters(http)
+
+    result.counters = {name: after[name] - before[name] for name in COUNTERS}
+    return result
+
+
+async def main(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    processes: List[subprocess.Popen] = []
+    app_url = args.app_url
+
+    try:
+        if app_url is None:
+            stub = start_process(
+                [
+                    "-m", "benchmarks.fake_piston_server",
+                    "--port", str(args.stub_port),
+                    "--latency", str(args.latency),
+                    "--compile-cost", str(args.compile_cost),
+                    "--failure-rate", str(args.failure_rate),
+                ],
+                {},
+            )
+            processes.append(stub)
+            await wait_until_up(f"http://127.0.0.1:{args.stub_port}/stats", stub)
+
+            app_url = f"http://127.0.0.1:{args.app_port}"
+            app = start_process(
+                [
+                    "-m", "uvicorn", "app.main:app",
+                    "--port", str(args.app_port),
+                    "--log-level", "warning",
+                ],
+                {
+                    "PISTON_API_URL": f"http://127.0.0.1:{args.stub_port}/api/v2/execute",
+                    "PISTON_BACKENDS": "",
+                    "JUDGE_WORKERS": str(args.judge_workers),
+                    **dict(args.app_env),
+                },
+            )
+            processes.append(app)
+            await wait_until_up(f"{app_url}/health", app)
+
+        user_id, problem_id = await seed(args.test_cases)
+        token = create_access_token({"sub": str(user_id)})
+        nonce = None if args.repeat_source else str(int(time.time()))
+
+        summaries: List[Dict[str, Any]] = []
+        async with httpx.AsyncClient(
+            base_url=app_url,
+            cookies={"access_token": token},
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=max(args.concurrency) + 1),
+        ) as http:
+            for mode in args.modes:
+                for concurrency in args.concurrency:
+                    result = await run_level(
+                        http, mode, concurrency, args.requests,
+                        problem_id, args.language, nonce,
+                    )
+                    summaries.append(result.summary())
+
+        print_table(summaries)
+        return summaries
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        await engine.dispose()
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def _env_pair(value: str) -> Tuple[str, str]:
+    key, sep, val = value.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {value!r}")
+    return key, val
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CodeRed judge benchmark")
+    parser.add_argument("--modes", default="run,submit",
+                        type=lambda v: [m for m in v.split(",") if m in ("run", "submit")])
+    parser.add_argument("--concurrency", default=[1, 8, 32], type=_int_list)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per mode and concurrency level")
+    parser.add_argument("--language", type=int, default=71, choices=sorted(ECHO_PROGRAMS))
+    parser.add_argument("--test-cases", type=int, default=10)
+    parser.add_argument("--repeat-source", action="store_true",
+                        help="send the same source every time (result cache hits)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--judge-workers", type=int, default=4)
+    # fake runner
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--compile-cost", type=float, default=0.2)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    # servers
+    parser.add_argument("--app-url", default=None,
+                        help="benchmark a running API instead of starting one")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--app-env", action="append", default=[], type=_env_pair,
+                        metavar="KEY=VALUE", help="extra setting for the started API")
+    parser.add_argument("--stub-port", type=int, default=2765)
+    parser.add_argument("--json", default=None, help="also write the results here")
+    args = parser.parse_args()
+
+    summaries = asyncio.run(main(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summaries, f, indent=2)
@@ -0,0 +1,18 @@
+-- =====================================================
+-- submission_claimed_at.sql
+-- Judge queue support on the table the app uses (`submission`, as created
+-- by the ORM models; submissions.sql describes an older `submissions`):
+--   * submission.claimed_at, set when a judge worker claims a row and
+--     refreshed while it judges; stale claims are requeued
+--   * partial indexes for the claim query (oldest queued row) and the
+--     stale-claim requeue, so neither scans the submission history
+-- Dependencies: submission
+-- =====================================================
+
+ALTER TABLE submission ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMPTZ DEFAULT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_submission_queued
+    ON submission(submission_id) WHERE verdict = 'Queued';
+
+CREATE INDEX IF NOT EXISTS idx_submission_judging_claimed_at
+    ON submission(claimed_at) WHERE verdict = 'Judging';
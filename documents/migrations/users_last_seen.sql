@@ -0,0 +1,7 @@
+-- =====================================================
+-- users_last_seen.sql
+-- Adds users.last_seen (written in bulk by the API's write-behind buffer)
+-- Dependencies: users
+-- =====================================================
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS last_seen TIMESTAMPTZ DEFAULT NULL;